@@ -1,26 +1,60 @@
 import os
+import threading
 
 from dotenv import load_dotenv
 
-from ri_topics.embedder import Embedder
-from ri_topics.logging import setup_logging
-from ri_topics.openreq.ri_storage_twitter import RiStorageTwitter
-from ri_topics.router import app
-from ri_topics.topics import TopicModelManager
+from ri_topics.timing import PhaseTimer, log_duration
+
+startup = PhaseTimer('Startup')
+
+with startup.phase('imports'):
+    from ri_topics.config import env_flag
+    from ri_topics.embedder import Embedder
+    from ri_topics.logging import setup_logging
+    from ri_topics.openreq.ri_storage_twitter import RiStorageTwitter
+    from ri_topics.router import app
+    from ri_topics.topics import TopicModelManager
+    from ri_topics.warmup import configure_numba_cache, warm_up
+
 
 if __name__ == '__main__':
-    setup_logging()
     load_dotenv()
+    # setting up logging imports numba, which only reads the cache directory on import
+    configure_numba_cache()
+    setup_logging()
 
     embedder = Embedder()
+    # the encoding workers are forked before any threads are started, so with EMBEDDING_WORKERS > 1 the SBERT model is
+    # loaded before binding, even with FAST_STARTUP
+    with startup.phase('encoding workers'):
+        embedder.start_workers()
+    if env_flag('NUMBA_WARMUP'):
+        threading.Thread(target=warm_up, daemon=True).start()
+
     rist = RiStorageTwitter(
         base_url=os.getenv('RI_STORAGE_TWITTER_BASE_URL'),
         bearer_token=os.getenv('BEARER_TOKEN'),
     )
 
     manager = TopicModelManager(embedder, rist)
-    manager.prepare_all()
+    # a trainer only trains and updates the models, which are served by the workers started from wsgi.py
+    serve = os.getenv('ROLE', 'all') != 'trainer'
+    if serve and env_flag('FAST_STARTUP'):
+        # bind right away and load the persisted models in the background, as unpickling them imports UMAP, HDBSCAN
+        # and numba. Models that are requested before are loaded on their first request. Missing models are trained
+        # afterwards.
+        def prepare_in_background():
+            with log_duration('Loading persisted models'):
+                manager.load_persisted()
+            manager.prepare_all()
+
+        threading.Thread(target=prepare_in_background, daemon=True).start()
+    else:
+        with startup.phase('preparing models'):
+            manager.prepare_all()
     manager.schedule_updates()
+    startup.log_summary()
 
-    app.model_manager = manager
-    app.run(host='0.0.0.0', port='8888')
+    if serve:
+        app.model_manager = manager
+        app.run(host='0.0.0.0', port='8888')
@@ -0,0 +1,80 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, List, TypeVar, Generic, Optional
+
+from loguru import logger
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+@dataclass
+class _Request(Generic[T]):
+    item: T
+    future: Future
+
+
+class MicroBatcher(Generic[T, R]):
+    """Collects items submitted by concurrent callers and processes them together.
+
+    A batch is processed as soon as it holds `max_batch_size` items or `max_wait_seconds` passed since its first
+    item arrived, so no caller waits longer than the latency budget for others to join its batch. If a batch fails, its
+    items are processed one by one, so that only the callers of failing items receive the error."""
+    def __init__(self, process_batch: Callable[[List[T]], List[R]], max_batch_size: int = 64,
+                 max_wait_seconds: float = 0.01):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+
+        self._queue: 'queue.Queue[_Request[T]]' = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._thread_lock = threading.Lock()
+
+    def submit(self, item: T) -> 'Future[R]':
+        self._ensure_running()
+        future = Future()
+        self._queue.put(_Request(item=item, future=future))
+        return future
+
+    def _ensure_running(self):
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='MicroBatcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._process(self._next_batch())
+
+    def _next_batch(self) -> List[_Request[T]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _process(self, batch: List[_Request[T]]):
+        try:
+            results = self.process_batch([request.item for request in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                logger.exception('Processing batch failed')
+                batch[0].future.set_exception(e)
+            else:
+                logger.warning(f'Processing a batch of {len(batch)} items failed, processing them one by one')
+                for request in batch:
+                    self._process([request])
+        else:
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
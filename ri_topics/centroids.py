@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+QUANTILE_LEVELS = np.linspace(0, 1, 21)
+# (quantile level, margin) pairs that are tried when calibrating the noise threshold, see CentroidIndex._thresholds
+THRESHOLD_CANDIDATES = [(level, margin) for level in [0.05, 0.1, 0.] for margin in [0., 1., 3., 10.]]
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+@dataclass
+class CentroidIndex:
+    """Assigns embeddings to the cluster with the most similar centroid, without running UMAP or HDBSCAN.
+
+    Every cluster keeps the quantiles of the cosine similarities between its members and its centroid. They calibrate
+    the assignment: embeddings less similar than the `threshold` of the closest cluster are noise, the probability of
+    all others is the share of members that are less similar to the centroid than the new embedding."""
+    labels: np.ndarray
+    centroids: np.ndarray
+    thresholds: np.ndarray
+    quantiles: np.ndarray
+    agreement: float = 0.
+
+    def assign(self, embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        similarities = normalize_rows(np.asarray(embeddings, dtype=np.float32)) @ self.centroids.T
+        closest = np.argmax(similarities, axis=1)
+        closest_similarity = similarities[np.arange(len(closest)), closest]
+
+        probabilities = np.zeros(len(closest), dtype=np.float64)
+        for cluster in np.unique(closest):
+            mask = closest == cluster
+            probabilities[mask] = np.interp(closest_similarity[mask], self.quantiles[cluster], QUANTILE_LEVELS)
+
+        is_noise = closest_similarity < self.thresholds[closest]
+        labels = np.where(is_noise, -1, self.labels[closest])
+        probabilities[is_noise] = 0.
+
+        return labels, probabilities
+
+    @staticmethod
+    def build(embeddings: np.ndarray, labels: np.ndarray, holdout_fraction: float = 0.2) -> Optional['CentroidIndex']:
+        """Builds the index from the clustered embeddings. The noise threshold is calibrated on a random holdout set,
+        which is not used for computing the centroids of the probe index. The `agreement` with the given labels on
+        the holdout set tells whether the index is a good enough replacement for UMAP and HDBSCAN."""
+        if not np.any(labels >= 0):
+            return None
+
+        normalized = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+        is_holdout = np.random.RandomState(0).random_sample(len(labels)) < holdout_fraction
+
+        best_threshold, best_agreement = THRESHOLD_CANDIDATES[0], 0.
+        if np.any(is_holdout) and np.any(labels[~is_holdout] >= 0):
+            probe = CentroidIndex._from_members(normalized[~is_holdout], labels[~is_holdout])
+            for threshold in THRESHOLD_CANDIDATES:
+                probe.thresholds = probe._thresholds(*threshold)
+                probe_labels, _ = probe.assign(normalized[is_holdout])
+                agreement = float(np.mean(probe_labels == labels[is_holdout]))
+                if agreement > best_agreement:
+                    best_threshold, best_agreement = threshold, agreement
+
+        index = CentroidIndex._from_members(normalized, labels)
+        index.thresholds = index._thresholds(*best_threshold)
+        index.agreement = best_agreement
+        return index
+
+    def _thresholds(self, level: float, margin: float) -> np.ndarray:
+        """Quantile of the member similarities at `level`, lowered by `margin` times their spread (median - 5%)"""
+        def at(quantile_level):
+            return self.quantiles[:, int(np.argmin(np.abs(QUANTILE_LEVELS - quantile_level)))]
+
+        return at(level) - margin * (at(0.5) - at(0.05))
+
+    @staticmethod
+    def _from_members(normalized: np.ndarray, labels: np.ndarray) -> 'CentroidIndex':
+        is_member = labels >= 0
+        cluster_labels, member_clusters = np.unique(labels[is_member], return_inverse=True)
+
+        sums = np.zeros((len(cluster_labels), normalized.shape[1]), dtype=np.float32)
+        np.add.at(sums, member_clusters, normalized[is_member])
+        centroids = normalize_rows(sums)
+
+        member_similarities = np.einsum('ij,ij->i', normalized[is_member], centroids[member_clusters])
+        quantiles = np.array([
+            np.quantile(member_similarities[member_clusters == cluster], QUANTILE_LEVELS)
+            for cluster in range(len(cluster_labels))
+        ])
+
+        return CentroidIndex(
+            labels=cluster_labels,
+            centroids=centroids,
+            thresholds=quantiles[:, 0],
+            quantiles=quantiles,
+        )
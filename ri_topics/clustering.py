@@ -1,19 +1,40 @@
+import dataclasses
+import os
+import time
 from dataclasses import dataclass
 from typing import Optional
 
 import numpy as np
-import hdbscan
 from loguru import logger
-from sklearn.preprocessing import StandardScaler
-import umap
 
-from ri_topics.util import clamp
+from ri_topics.centroids import CentroidIndex
+from ri_topics.config import env_flag
+from ri_topics.cost_model import CostEstimate, ResourceBudget, estimate_fit_cost, peak_memory_mb
+from ri_topics.matching import relabel
+from ri_topics.util import clamp, LazyModule
+
+# UMAP and HDBSCAN pull in numba and compile on import, so they are only loaded once clustering is actually needed
+umap = LazyModule('umap')
+hdbscan = LazyModule('hdbscan')
+sklearn_preprocessing = LazyModule('sklearn.preprocessing')
+
+REDUCED_N_COMPONENTS = 5
+MIN_SAMPLE_SIZE = 1000
+PREDICT_CHUNK_SIZE = 10000
 
 
 @dataclass
 class ClusterAssignment:
     labels: np.ndarray
     probabilities: np.ndarray
+    condensed_tree: Optional[np.ndarray] = None
+    # indices of the embeddings the condensed tree was built from if the clusterer was fitted on a subsample
+    sample_idxs: Optional[np.ndarray] = None
+
+    @property
+    def tree_labels(self) -> np.ndarray:
+        """The labels of the points in the condensed tree"""
+        return self.labels if self.sample_idxs is None else self.labels[self.sample_idxs]
 
 
 @dataclass
@@ -35,11 +56,68 @@ class ClustererParams:
         )
 
 
+@dataclass
+class FitStrategy:
+    """How the clusterer is fitted: with which parameters and, unless on all embeddings, on how large a subsample.
+    Embeddings outside the subsample are assigned to the fitted clusters in chunks."""
+    name: str
+    params: ClustererParams
+    sample_size: int
+    estimate: CostEstimate
+
+    @staticmethod
+    def choose(n: int, dim: int, budget: ResourceBudget) -> 'FitStrategy':
+        """Picks the first strategy within budget: a full fit, a fit with fewer UMAP components or a fit on the largest
+        subsample within budget. If not even the smallest subsample is within budget, it is used anyway. Any strategy
+        but the full fit is logged as a warning, since it trades the quality of the topics for staying in budget."""
+        full = FitStrategy._for_sample_size('full', n, n, dim)
+        if budget.allows(full.estimate):
+            return full
+
+        logger.warning(f'Fitting all {n} embeddings is predicted to take {full.estimate}, which exceeds the budget '
+                       f'{budget}')
+        reduced = FitStrategy._for_sample_size('reduced_components', n, n, dim, max_components=REDUCED_N_COMPONENTS)
+        if budget.allows(reduced.estimate):
+            logger.warning(f'Fitting with at most {REDUCED_N_COMPONENTS} UMAP components instead')
+            return reduced
+
+        low, high = min(n, MIN_SAMPLE_SIZE), n
+        while low < high:
+            mid = (low + high + 1) // 2
+            if budget.allows(FitStrategy._for_sample_size('subsample', mid, n, dim, max_components=REDUCED_N_COMPONENTS).estimate):
+                low = mid
+            else:
+                high = mid - 1
+
+        strategy = FitStrategy._for_sample_size('subsample', low, n, dim, max_components=REDUCED_N_COMPONENTS)
+        logger.warning(f'Fitting a subsample of {low} embeddings instead'
+                       + ('' if budget.allows(strategy.estimate) else ', which exceeds the budget as well'))
+        return strategy
+
+    @staticmethod
+    def _for_sample_size(name: str, sample_size: int, n: int, dim: int, max_components: int = None) -> 'FitStrategy':
+        params = ClustererParams.for_sample_size(sample_size)
+        if max_components is not None:
+            params = dataclasses.replace(params, n_components=min(params.n_components, max_components))
+
+        return FitStrategy(name, params, sample_size, estimate_fit_cost(sample_size, dim, params, n_total=n))
+
+
 class Clusterer:
     """Clustering using UMAP and HDBSCAN"""
     def __init__(self):
-        self.umap: Optional[umap.UMAP] = None
-        self.hdbscan: Optional[hdbscan.HDBSCAN] = None
+        self.umap: Optional['umap.UMAP'] = None
+        self.hdbscan: Optional['hdbscan.HDBSCAN'] = None
+        # standardizes embeddings before UMAP, None for clusterers pickled before it was kept
+        self.scaler: Optional['sklearn_preprocessing.StandardScaler'] = None
+        self.centroid_index: Optional[CentroidIndex] = None
+        # maps the fitted cluster labels to stable topic ids if the topics were matched to those of an earlier fit
+        self.label_map: Optional[np.ndarray] = None
+
+    def __setstate__(self, state):
+        # fill attributes that did not exist yet when the clusterer was pickled
+        self.__init__()
+        self.__dict__.update(state)
 
     @property
     def is_fitted(self) -> bool:
@@ -50,28 +128,87 @@ class Clusterer:
             logger.warning(f'Not fitting clusterer because too few embeddings are provided ({len(embeddings)})')
             return Clusterer._empty_assignment(len(embeddings))
 
-        params = ClustererParams.for_sample_size(len(embeddings))
-        embeddings_st = StandardScaler().fit_transform(embeddings)
+        strategy = FitStrategy.choose(len(embeddings), embeddings.shape[1], ResourceBudget.from_env())
+        logger.info(f'Fitting {strategy.sample_size} of {len(embeddings)} embeddings with strategy {strategy.name}, '
+                    f'predicted to take {strategy.estimate}')
+        start_time, start_peak_memory = time.monotonic(), peak_memory_mb()
+
+        params = strategy.params
+        sample_idxs = None
+        if strategy.sample_size < len(embeddings):
+            sample_idxs = np.sort(np.random.choice(len(embeddings), size=strategy.sample_size, replace=False))
+        sample = embeddings if sample_idxs is None else embeddings[sample_idxs]
+
+        self.scaler = sklearn_preprocessing.StandardScaler().fit(sample)
+        sample_st = self.scaler.transform(sample)
 
         logger.info('Fitting UMAP')
         self.umap = umap.UMAP(n_components=params.n_components, n_neighbors=params.n_neighbors, min_dist=params.min_dist)
-        embeddings_umap = self.umap.fit_transform(embeddings_st)
+        embeddings_umap = self.umap.fit_transform(sample_st)
 
         logger.info('Running HDBSCAN')
         self.hdbscan = hdbscan.HDBSCAN(min_cluster_size=params.min_cluster_size, min_samples=params.min_samples, prediction_data=True)
         self.hdbscan.fit(embeddings_umap)
 
-        return ClusterAssignment(labels=self.hdbscan.labels_, probabilities=self.hdbscan.probabilities_)
+        labels, probabilities = self.hdbscan.labels_, self.hdbscan.probabilities_
+        if sample_idxs is not None:
+            logger.info(f'Assigning the {len(embeddings) - len(sample_idxs)} embeddings outside the subsample')
+            labels = np.full(len(embeddings), fill_value=-1, dtype=labels.dtype)
+            probabilities = np.zeros(len(embeddings), dtype=probabilities.dtype)
+            labels[sample_idxs], probabilities[sample_idxs] = self.hdbscan.labels_, self.hdbscan.probabilities_
+
+            rest_idxs = np.setdiff1d(np.arange(len(embeddings)), sample_idxs)
+            for chunk_idxs in np.array_split(rest_idxs, max(1, int(np.ceil(len(rest_idxs) / PREDICT_CHUNK_SIZE)))):
+                labels[chunk_idxs], probabilities[chunk_idxs] = \
+                    self._approximate_predict(embeddings[chunk_idxs])
+
+        logger.info('Building centroid index')
+        self.centroid_index = CentroidIndex.build(sample, self.hdbscan.labels_)
+        if self.centroid_index is not None:
+            logger.info(f'Centroid index agrees with {self.centroid_index.agreement:0.01%} of held out assignments')
+
+        # ru_maxrss is a high-water mark, so the fit only shows if it raised the peak memory of the process
+        logger.info(f'Fitting took {time.monotonic() - start_time:0.0f} s (predicted {strategy.estimate.seconds:0.0f} s), '
+                    f'peak memory grew by {peak_memory_mb() - start_peak_memory:0.0f} MB '
+                    f'(predicted {strategy.estimate.peak_memory_mb:0.0f} MB)')
+
+        return ClusterAssignment(
+            labels=labels,
+            probabilities=probabilities,
+            condensed_tree=self.hdbscan.condensed_tree_.to_numpy(),
+            sample_idxs=sample_idxs,
+        )
+
+    @property
+    def has_reliable_fast_path(self) -> bool:
+        min_agreement = float(os.getenv('FAST_PREDICT_MIN_AGREEMENT', 0.9))
+        return self.centroid_index is not None and self.centroid_index.agreement >= min_agreement
 
-    def predict(self, embeddings: np.ndarray):
+    def predict(self, embeddings: np.ndarray, allow_fast_path: bool = None):
+        """Assigns new embeddings to the fitted clusters. If allowed (by default via FAST_PREDICT) and reliable enough,
+        the embeddings are assigned to the most similar cluster centroid instead of running UMAP and HDBSCAN."""
         if not self.is_fitted:
             return Clusterer._empty_assignment(len(embeddings))
 
-        embeddings_umap = self.umap.transform(embeddings)
-        labels, probabilities = hdbscan.approximate_predict(self.hdbscan, embeddings_umap)
+        if allow_fast_path is None:
+            allow_fast_path = env_flag('FAST_PREDICT')
+        if allow_fast_path and self.has_reliable_fast_path:
+            labels, probabilities = self.centroid_index.assign(embeddings)
+        else:
+            labels, probabilities = self._approximate_predict(embeddings)
+
+        if self.label_map is not None:
+            labels = relabel(labels, self.label_map)
 
         return ClusterAssignment(labels=labels, probabilities=probabilities)
 
+    def _approximate_predict(self, embeddings: np.ndarray):
+        """Assigns embeddings by standardizing them like the fitted ones, projecting them with UMAP and running HDBSCAN's
+        approximate prediction"""
+        embeddings_st = self.scaler.transform(embeddings) if self.scaler is not None else embeddings
+        embeddings_umap = self.umap.transform(embeddings_st)
+        return hdbscan.approximate_predict(self.hdbscan, embeddings_umap)
+
     @staticmethod
     def _empty_assignment(n: int = 0):
         return ClusterAssignment(
@@ -1,7 +1,48 @@
+import os
 from pathlib import Path
+from typing import Dict, List, Optional
 
 DATA_DIR = Path.cwd() / 'data'
 MODEL_DIR = DATA_DIR / 'models'
 
 for directory in [DATA_DIR, MODEL_DIR]:
     directory.mkdir(exist_ok=True)
+
+
+def env_flag(name: str, default: bool = False) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+
+    return value.strip().lower() in ['1', 'true', 'yes', 'on']
+
+
+def account_groups() -> Dict[str, List[str]]:
+    """Groups of accounts that share one topic model, configured as ACCOUNT_GROUPS=group:account,account;group:..."""
+    groups = {}
+    for group in filter(None, os.getenv('ACCOUNT_GROUPS', '').split(';')):
+        name, accounts = group.split(':', 1)
+        groups[name.strip()] = [account.strip() for account in accounts.split(',') if account.strip()]
+
+    return groups
+
+
+def languages() -> Optional[List[str]]:
+    """Languages of the tweets that are processed, configured as LANGUAGES=en,de,... The tweets of all languages are
+    processed by default or with LANGUAGES=*, which is None."""
+    value = os.getenv('LANGUAGES', '*').strip()
+    if value == '*':
+        return None
+
+    return [lang.strip() for lang in value.split(',') if lang.strip()]
+
+
+def update_intervals() -> Dict[str, float]:
+    """Update intervals in minutes of individual models, configured as UPDATE_INTERVALS=model:minutes;model:minutes.
+    Models of account groups are named after the group."""
+    intervals = {}
+    for entry in filter(None, os.getenv('UPDATE_INTERVALS', '').split(';')):
+        name, minutes = entry.split(':', 1)
+        intervals[name.strip()] = float(minutes)
+
+    return intervals
@@ -0,0 +1,93 @@
+import math
+import os
+import resource
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ri_topics.clustering import ClustererParams
+
+MB = 1024 ** 2
+
+# Rough per-element costs of the fitting steps. They are only meant to tell a fit that works apart from one that
+# exhausts the container; the fit logs predicted and actual costs, which is what these should be tuned against.
+FLOAT32_BYTES = 4
+FLOAT64_BYTES = 8
+INDEX_BYTES = 8
+UMAP_EXACT_NEIGHBORS_MAX_N = 4096  # below this, UMAP computes the full pairwise distance matrix
+UMAP_NN_SECONDS = 2e-9  # per n * n_neighbors * dim * log2(n)
+UMAP_EPOCH_SECONDS = 5e-9  # per n * n_neighbors * n_components * epoch
+HDBSCAN_SECONDS = 1e-7  # per n * log2(n) * min_samples * n_components
+SCALING_SECONDS = 2e-9  # per n * dim
+OVERHEAD_FACTOR = 1.3
+
+
+@dataclass
+class CostEstimate:
+    peak_memory_mb: float
+    seconds: float
+
+    def __str__(self):
+        return f'{self.peak_memory_mb:0.0f} MB, {self.seconds:0.0f} s'
+
+
+@dataclass
+class ResourceBudget:
+    memory_mb: Optional[float] = None
+    seconds: Optional[float] = None
+
+    @staticmethod
+    def from_env() -> 'ResourceBudget':
+        """Budget from CLUSTERING_MEMORY_BUDGET_MB and CLUSTERING_TIME_BUDGET_S. Unconfigured budgets are unlimited."""
+        memory_mb = os.getenv('CLUSTERING_MEMORY_BUDGET_MB')
+        seconds = os.getenv('CLUSTERING_TIME_BUDGET_S')
+        return ResourceBudget(
+            memory_mb=float(memory_mb) if memory_mb else None,
+            seconds=float(seconds) if seconds else None,
+        )
+
+    def allows(self, estimate: CostEstimate) -> bool:
+        return (self.memory_mb is None or estimate.peak_memory_mb <= self.memory_mb) \
+            and (self.seconds is None or estimate.seconds <= self.seconds)
+
+
+def estimate_fit_cost(n: int, dim: int, params: 'ClustererParams', n_total: int = None) -> CostEstimate:
+    """Estimates the peak memory and runtime of scaling, UMAP, HDBSCAN and the centroid index when fitting on n of
+    n_total (by default n) embeddings"""
+    k, c = params.n_neighbors, params.n_components
+    log_n = math.log2(max(n, 2))
+    epochs = 500 if n <= 10000 else 200
+
+    # all float32 embeddings and the standardized float64 copy of the fitted ones are held during the whole fit
+    resident = (n_total or n) * dim * FLOAT32_BYTES + n * dim * FLOAT64_BYTES
+    scaling = n * dim * FLOAT64_BYTES
+    umap = n * k * (INDEX_BYTES + FLOAT32_BYTES) * 3 \
+        + 2 * n * k * 3 * FLOAT32_BYTES \
+        + n * c * FLOAT32_BYTES
+    if n < UMAP_EXACT_NEIGHBORS_MAX_N:
+        umap += n * n * FLOAT64_BYTES
+    hdbscan = n * c * FLOAT64_BYTES * 4 + n * params.min_samples * (INDEX_BYTES + FLOAT64_BYTES)
+    centroids = n * dim * FLOAT64_BYTES * 2
+
+    peak = resident + max(scaling, umap, hdbscan, centroids)
+    seconds = SCALING_SECONDS * n * dim \
+        + UMAP_NN_SECONDS * n * k * dim * log_n \
+        + UMAP_EPOCH_SECONDS * n * k * c * epochs \
+        + HDBSCAN_SECONDS * n * log_n * params.min_samples * c
+
+    return CostEstimate(peak_memory_mb=OVERHEAD_FACTOR * peak / MB, seconds=OVERHEAD_FACTOR * seconds)
+
+
+def current_memory_mb() -> float:
+    try:
+        resident_pages = int(Path('/proc/self/statm').read_text().split()[1])
+    except OSError:
+        return peak_memory_mb()
+
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / MB
+
+
+def peak_memory_mb() -> float:
+    """Peak resident memory of the process so far. ru_maxrss is in kilobytes on Linux."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
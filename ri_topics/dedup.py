@@ -0,0 +1,123 @@
+import hashlib
+import itertools
+import re
+from dataclasses import dataclass
+from typing import List, Iterable
+
+import numpy as np
+
+URL_PATTERN = re.compile(r'https?://\S+')
+MENTION_PATTERN = re.compile(r'@\w+')
+RETWEET_PATTERN = re.compile(r'^rt\s+')
+NON_WORD_PATTERN = re.compile(r'[^\w\s]')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+@dataclass
+class Deduplication:
+    """Maps a list of texts to its unique representatives.
+
+    `representative_idxs` contains the position of one representative text per group, `inverse` maps every text to
+    the position of its group within `representative_idxs`."""
+    representative_idxs: np.ndarray
+    inverse: np.ndarray
+
+    @property
+    def n_unique(self) -> int:
+        return len(self.representative_idxs)
+
+    def fan_out(self, values: np.ndarray) -> np.ndarray:
+        """Broadcasts values computed for the representatives back to all texts"""
+        return values[self.inverse]
+
+
+def normalize_text(text: str) -> str:
+    text = text.lower()
+    text = URL_PATTERN.sub(' ', text)
+    text = MENTION_PATTERN.sub(' ', text)
+    text = RETWEET_PATTERN.sub('', text.strip())
+    text = NON_WORD_PATTERN.sub(' ', text)
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def text_hash(text: str) -> int:
+    return int.from_bytes(hashlib.md5(text.encode('utf-8')).digest()[:8], 'little')
+
+
+def simhash(text: str, n_gram: int = 1) -> int:
+    tokens = text.split()
+    shingles = [' '.join(tokens[i:i+n_gram]) for i in range(max(1, len(tokens) - n_gram + 1))]
+
+    bit_positions = np.arange(64, dtype=np.uint64)
+    weights = np.zeros(64, dtype=np.int64)
+    for shingle in shingles:
+        bits = (np.uint64(text_hash(shingle)) >> bit_positions) & np.uint64(1)
+        weights += np.where(bits, 1, -1)
+
+    return sum(1 << int(bit) for bit in np.flatnonzero(weights > 0))
+
+
+def deduplicate(texts: Iterable[str], near_duplicates: bool = False, max_distance: int = 6) -> Deduplication:
+    """Groups exact duplicates after normalization and optionally also near duplicates, whose SimHash fingerprints
+    differ in at most `max_distance` bits. Texts that are empty after normalization, e.g. ones that only contain
+    links or mentions, are kept apart, as they have nothing in common."""
+    normalized = [normalize_text(text) for text in texts]
+    group_of = np.arange(len(normalized))
+
+    first_by_hash = {}
+    for idx, text in enumerate(normalized):
+        if text:
+            group_of[idx] = first_by_hash.setdefault(text_hash(text), idx)
+
+    if near_duplicates:
+        _merge_near_duplicates(normalized, group_of, max_distance)
+
+    representative_idxs, inverse = np.unique(group_of, return_inverse=True)
+    return Deduplication(representative_idxs=representative_idxs, inverse=inverse)
+
+
+def popcount(values: np.ndarray) -> np.ndarray:
+    return np.unpackbits(values.astype(np.uint64).view(np.uint8).reshape(*values.shape, 8), axis=-1).sum(axis=-1)
+
+
+def _merge_near_duplicates(normalized: List[str], group_of: np.ndarray, max_distance: int,
+                           max_bucket_size: int = 256):
+    """Links representatives whose fingerprints are within `max_distance` bits. Candidates are found with blocks: of
+    `max_distance + 2` blocks, near duplicates have to share at least two blocks exactly, so every pair of blocks is
+    used as a bucket key. The keys are twice as wide as single blocks, which keeps the buckets small. Only the first
+    `max_bucket_size` members of a bucket are compared, so a few very common fingerprints can not make it quadratic."""
+    representatives = np.array([idx for idx in np.unique(group_of) if normalized[idx]], dtype=np.int64)
+    if len(representatives) < 2:
+        return
+
+    fingerprints = np.array([simhash(normalized[idx]) for idx in representatives], dtype=np.uint64)
+    n_blocks = max_distance + 2
+    block_width = 64 // n_blocks
+    block_mask = np.uint64((1 << block_width) - 1)
+    blocks = [(fingerprints >> np.uint64(block * block_width)) & block_mask for block in range(n_blocks)]
+    parent = np.arange(len(representatives))
+
+    def find(idx):
+        while parent[idx] != idx:
+            parent[idx] = parent[parent[idx]]
+            idx = parent[idx]
+        return idx
+
+    for first, second in itertools.combinations(range(n_blocks), 2):
+        keys = (blocks[first] << np.uint64(block_width)) | blocks[second]
+        order = np.argsort(keys, kind='stable')
+        sorted_keys = keys[order]
+        bucket_starts = np.flatnonzero(np.concatenate([[True], sorted_keys[1:] != sorted_keys[:-1]]))
+        for start, stop in zip(bucket_starts, np.append(bucket_starts[1:], len(order))):
+            if stop - start < 2:
+                continue
+
+            members = order[start:min(stop, start + max_bucket_size)]
+            distances = popcount(fingerprints[members, None] ^ fingerprints[None, members])
+            for a, b in zip(*np.nonzero(np.triu(distances <= max_distance, k=1))):
+                root_a, root_b = find(members[a]), find(members[b])
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+    root_of = dict(zip(representatives, representatives[[find(idx) for idx in range(len(representatives))]]))
+    for idx in range(len(group_of)):
+        group_of[idx] = root_of.get(group_of[idx], group_of[idx])
@@ -21,6 +21,7 @@ class Topic:
     name: Optional[str]
     representative: Representative
     member_ids: List[int]
+    keywords: List[str]
 
     @staticmethod
     def from_df_tuple(t, member_ids: List[int]):
@@ -29,4 +30,75 @@ class Topic:
             name=t.name,
             representative=Representative.from_df_tuple(t),
             member_ids=member_ids,
+            keywords=t.keywords,
+        )
+
+
+@dataclass
+class Classification:
+    status_id: Optional[str]
+    label: int
+    probability: float
+
+
+@dataclass
+class Trend:
+    topic_id: int
+    resolution: str
+    timestamps: List[str]
+    counts: List[int]
+
+
+@dataclass
+class TopicNode:
+    node_id: int
+    parent_id: int
+    size: int
+    stability: float
+    topic_id: Optional[int]
+    topic_ids: List[int]
+
+    @staticmethod
+    def from_df_tuple(t):
+        return TopicNode(
+            node_id=int(t.Index),
+            parent_id=int(t.parent_id),
+            size=int(t.size),
+            stability=float(t.stability),
+            topic_id=int(t.topic_id) if t.topic_id >= 0 else None,
+            topic_ids=[int(topic_id) for topic_id in t.topic_ids],
+        )
+
+
+@dataclass
+class SearchResult:
+    status_id: str
+    score: float
+    label: int
+
+    @staticmethod
+    def from_df_tuple(t):
+        return SearchResult(
+            status_id=t.Index,
+            score=float(t.score),
+            label=int(t.label),
+        )
+
+
+@dataclass
+class LineageEdge:
+    generation: int
+    parent_id: int
+    topic_id: int
+    shared_tweets: int
+    jaccard: float
+
+    @staticmethod
+    def from_df_tuple(t):
+        return LineageEdge(
+            generation=int(t.generation),
+            parent_id=int(t.parent_id),
+            topic_id=int(t.topic_id),
+            shared_tweets=int(t.shared_tweets),
+            jaccard=float(t.jaccard),
         )
@@ -1,32 +1,141 @@
+import multiprocessing
 import os
-from typing import List
+import threading
+from typing import List, Optional, Tuple, TYPE_CHECKING
 
 import numpy as np
 from loguru import logger
-from sentence_transformers import SentenceTransformer
 from tqdm import tqdm
 
-from ri_topics.preprocessing import Document
+from ri_topics.preprocessing import Document, DEFAULT_LANGUAGE
+from ri_topics.timing import log_duration
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+# State inherited by the forked encoding workers. It is set right before the pool is forked so that the workers share
+# the already loaded model and the output buffer with the parent process instead of receiving pickled copies.
+_worker_model: Optional['SentenceTransformer'] = None
+_worker_output: Optional[np.ndarray] = None
+
+
+def _init_worker(n_threads: int):
+    import torch
+    torch.set_num_threads(n_threads)
+
+
+def _encode_chunk(chunk: Tuple[int, List[str]]):
+    start, sentences = chunk
+    _worker_output[start:start+len(sentences)] = _worker_model.encode(sentences, show_progress_bar=False)
+
+
+class ParallelEncoder:
+    """Encodes sentences on a persistent pool of forked worker processes.
+
+    The pool is forked once, right after the model is loaded and before the process starts any threads, as forking a
+    multi-threaded process can deadlock. The workers share the model and an output buffer of `capacity` sentences with
+    the parent process through copy-on-write memory and write their embeddings directly into the buffer, so no
+    embeddings are pickled between processes. Longer inputs are encoded in windows of the buffer's capacity."""
+    def __init__(self, model: 'SentenceTransformer', n_workers: int, chunk_size: int = 256, capacity: int = 16384):
+        global _worker_model, _worker_output
+
+        self.n_workers = n_workers
+        self.chunk_size = chunk_size
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+        ctx = multiprocessing.get_context('fork')
+        dim = model.get_sentence_embedding_dimension()
+        self._output = np.frombuffer(ctx.RawArray('f', capacity * dim), dtype=np.float32).reshape((capacity, dim))
+        _worker_model, _worker_output = model, self._output
+        n_threads = max(1, os.cpu_count() // n_workers)
+        self._pool = ctx.Pool(n_workers, initializer=_init_worker, initargs=(n_threads,))
+
+    def encode(self, sentences: List[str], show_progress=True) -> np.ndarray:
+        embeddings = np.empty((len(sentences), self._output.shape[1]), dtype=np.float32)
+        # the output buffer is shared, so only one call encodes at a time
+        with self._lock:
+            for offset in range(0, len(sentences), self.capacity):
+                window = sentences[offset:offset+self.capacity]
+                chunks = [(start, window[start:start+self.chunk_size])
+                          for start in range(0, len(window), self.chunk_size)]
+                results = self._pool.imap_unordered(_encode_chunk, chunks)
+                for _ in tqdm(results, total=len(chunks), unit='Batches', disable=not show_progress):
+                    pass
+                embeddings[offset:offset+len(window)] = self._output[:len(window)]
+
+        return embeddings
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
 
 
 class Embedder:
-    def __init__(self, model: SentenceTransformer = None):
-        if model is None:
-            model = SentenceTransformer(os.getenv('SBERT_MODEL'))
+    """Embeds texts with SBERT. Unless a model is passed, it is only loaded once the first text is embedded.
+
+    Sentences are encoded in-process unless the pool of encoding workers was started and there are at least
+    `pool_min_sentences` of them, for which the overhead of distributing them pays off."""
+    def __init__(self, model: 'SentenceTransformer' = None, n_workers: int = None, pool_min_sentences: int = None):
+        if n_workers is None:
+            n_workers = int(os.getenv('EMBEDDING_WORKERS', 1))
+        if pool_min_sentences is None:
+            pool_min_sentences = int(os.getenv('EMBEDDING_POOL_MIN_SENTENCES', 1000))
+
+        self._model = model
+        self._model_lock = threading.Lock()
+        self.n_workers = n_workers
+        self.pool_min_sentences = pool_min_sentences
+        self._pool: Optional[ParallelEncoder] = None
 
-        self.model = model
+    @property
+    def model(self) -> 'SentenceTransformer':
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    with log_duration('Loading SBERT model'):
+                        from sentence_transformers import SentenceTransformer
+                        self._model = SentenceTransformer(os.getenv('SBERT_MODEL'))
 
-    def embed(self, docs: List[Document]):
+        return self._model
+
+    @property
+    def model_name(self) -> Optional[str]:
+        """Names the SBERT model, so that models can tell whether their tweets were embedded into the same space.
+        SBERT_MODEL_NAME names models that are loaded from a path, like in the Docker image."""
+        return os.getenv('SBERT_MODEL_NAME') or os.getenv('SBERT_MODEL')
+
+    def start_workers(self):
+        """Loads the model and forks the pool of EMBEDDING_WORKERS encoding processes. Has to be called before the
+        process starts any threads."""
+        if self.n_workers > 1 and self._pool is None:
+            logger.info(f'Starting {self.n_workers} encoding worker processes')
+            self._pool = ParallelEncoder(self.model, self.n_workers)
+
+    def embed(self, docs: List[Document], show_progress=True, use_pool=True):
         sentences = list(sent for doc in docs for sent in doc.sentences)
         logger.info(f'Generating embeddings for {len(sentences)} sentences')
-        embeddings = self.model.encode([str(sent) for sent in sentences], show_progress_bar=True)
+        embeddings = self._encode([str(sent) for sent in sentences], show_progress, use_pool)
         for sentence, embedding in zip(sentences, embeddings):
             sentence.embedding = embedding
 
-    def embed_texts(self, texts: List[str], show_progess=True) -> np.ndarray:
+    def embed_texts(self, texts: List[str], show_progess=True, langs: List[str] = None, use_pool=True) -> np.ndarray:
+        """Embeds texts, which are split into sentences according to their language (English by default). Unless
+        `use_pool` is false, long inputs are encoded on the pool of encoding workers if it was started."""
+        if langs is None:
+            langs = [DEFAULT_LANGUAGE] * len(texts)
+
         logger.info('Preprocessing texts')
         text_it = texts if not show_progess else tqdm(texts, desc='Preprocessing', unit='Tweets')
-        docs = [Document(text) for text in text_it]
+        docs = [Document(text, lang) for text, lang in zip(text_it, langs)]
 
-        self.embed(docs)
+        # encoding the sentences of one language together keeps the batches similar in vocabulary and length
+        self.embed(sorted(docs, key=lambda doc: doc.lang), show_progess, use_pool)
         return np.array([doc.embedding for doc in docs])
+
+    def _encode(self, sentences: List[str], show_progress=True, use_pool=True) -> np.ndarray:
+        if use_pool and self._pool is not None and len(sentences) >= self.pool_min_sentences:
+            logger.info(f'Encoding on {self.n_workers} worker processes')
+            return self._pool.encode(sentences, show_progress)
+        else:
+            return self.model.encode(sentences, show_progress_bar=show_progress)
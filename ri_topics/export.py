@@ -0,0 +1,180 @@
+"""Streams the topic assignments of accounts as NDJSON, Arrow IPC or Parquet, e.g.
+
+    python -m ri_topics.export FitbitSupport AppleSupport --format parquet --start 2020-01-01 --output topics.parquet
+
+Every row is a tweet with its topic id, name and keywords. The rows are written in chunks of EXPORT_CHUNK_SIZE
+tweets, so exports never hold more than one chunk of the joined table. Arrow and Parquet require pyarrow."""
+import argparse
+import importlib.util
+import io
+import os
+import sys
+from typing import Iterator, List, Optional, Union, TYPE_CHECKING
+
+import pandas as pd
+
+from ri_topics.util import LazyModule
+
+if TYPE_CHECKING:
+    from ri_topics.topics import TopicModel, AccountView
+
+pyarrow = LazyModule('pyarrow')
+pyarrow_parquet = LazyModule('pyarrow.parquet')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+}
+EXPORT_COLUMNS = ['status_id', 'account_name', 'created_at', 'label', 'probability', 'topic_name', 'keywords']
+
+
+class ExportFormatError(ValueError):
+    pass
+
+
+def check_format(export_format: str):
+    """Raises an ExportFormatError for unknown formats and columnar formats without pyarrow, which has to happen before
+    a response starts streaming"""
+    if export_format not in EXPORT_FORMATS:
+        raise ExportFormatError(f'Format must be one of {", ".join(EXPORT_FORMATS)}')
+    if export_format != 'ndjson' and importlib.util.find_spec('pyarrow') is None:
+        raise ExportFormatError(f'Exporting {export_format} requires pyarrow')
+
+
+def parse_timestamp(value: str) -> pd.Timestamp:
+    """Parses a time as the naive UTC timestamp that tweets are stored with"""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_convert(None) if timestamp.tzinfo is not None else timestamp
+
+
+def export_chunks(models: List[Union['TopicModel', 'AccountView']], start: Optional[pd.Timestamp] = None,
+                  end: Optional[pd.Timestamp] = None, chunk_size: int = None) -> Iterator[pd.DataFrame]:
+    """Yields the tweets created in [start, end) of each model, joined with the names and keywords of their topics"""
+    if chunk_size is None:
+        chunk_size = int(os.getenv('EXPORT_CHUNK_SIZE', 10000))
+
+    for model in models:
+        tweet_df = model.tweet_df
+        account_name = getattr(model, 'account_name', None)
+        topic_df = model.topic_df[['name', 'keywords']].rename(columns={'name': 'topic_name'})
+
+        for offset in range(0, len(tweet_df), chunk_size):
+            chunk = tweet_df.iloc[offset:offset+chunk_size]
+            if start is not None:
+                chunk = chunk[chunk['created_at'] >= start]
+            if end is not None:
+                chunk = chunk[chunk['created_at'] < end]
+            if len(chunk) == 0:
+                continue
+
+            chunk = chunk.join(topic_df, on='label').rename_axis('status_id').reset_index()
+            if 'account_name' not in chunk:
+                chunk['account_name'] = account_name
+            chunk['topic_name'] = chunk['topic_name'].astype(object).where(chunk['topic_name'].notna(), None)
+            chunk['keywords'] = [keywords if isinstance(keywords, list) else [] for keywords in chunk['keywords']]
+            yield chunk[EXPORT_COLUMNS]
+
+
+def serialize(chunks: Iterator[pd.DataFrame], export_format: str) -> Iterator[bytes]:
+    """Encodes the chunks in the given format, yielding the bytes of every chunk as soon as it is encoded"""
+    check_format(export_format)
+    if export_format == 'ndjson':
+        return _serialize_ndjson(chunks)
+    else:
+        return _serialize_arrow(chunks, parquet=export_format == 'parquet')
+
+
+def _serialize_ndjson(chunks: Iterator[pd.DataFrame]) -> Iterator[bytes]:
+    for chunk in chunks:
+        yield (chunk.to_json(orient='records', lines=True, date_format='iso').rstrip('\n') + '\n').encode()
+
+
+def _serialize_arrow(chunks: Iterator[pd.DataFrame], parquet: bool) -> Iterator[bytes]:
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pyarrow_parquet.ParquetWriter(sink, schema) if parquet else pyarrow.ipc.new_stream(sink, schema)
+
+    for chunk in chunks:
+        batch = pyarrow.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False)
+        if parquet:
+            # every chunk is a row group of its own
+            writer.write_table(pyarrow.Table.from_batches([batch]))
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+
+def _arrow_schema() -> 'pyarrow.Schema':
+    return pyarrow.schema([
+        ('status_id', pyarrow.string()),
+        ('account_name', pyarrow.string()),
+        ('created_at', pyarrow.timestamp('ms')),
+        ('label', pyarrow.int64()),
+        ('probability', pyarrow.float64()),
+        ('topic_name', pyarrow.string()),
+        ('keywords', pyarrow.list_(pyarrow.string())),
+    ])
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only stream that hands out what was written since it was last drained"""
+    def __init__(self):
+        super().__init__()
+        self._buffers = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, b) -> int:
+        self._buffers.append(bytes(b))
+        self._position += len(b)
+        return len(b)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b''.join(self._buffers)
+        self._buffers = []
+        return data
+
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Exports the topic assignments of persisted models')
+    parser.add_argument('accounts', nargs='+', help='accounts whose tweets are exported')
+    parser.add_argument('--format', choices=list(EXPORT_FORMATS), default='ndjson', dest='export_format')
+    parser.add_argument('--start', type=parse_timestamp, help='only export tweets created at or after this UTC time')
+    parser.add_argument('--end', type=parse_timestamp, help='only export tweets created before this UTC time')
+    parser.add_argument('--output', help='file to write to instead of stdout')
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    from ri_topics.embedder import Embedder
+    from ri_topics.topics import TopicModelManager
+
+    load_dotenv()
+    try:
+        check_format(args.export_format)
+    except ExportFormatError as e:
+        parser.error(str(e))
+
+    # models are only read, so neither tweets are fetched nor texts embedded
+    manager = TopicModelManager(Embedder(), storage=None, serving_only=True)
+    chunks = export_chunks([manager.get(account_name) for account_name in args.accounts], args.start, args.end)
+
+    output = open(args.output, mode='wb') if args.output else sys.stdout.buffer
+    try:
+        for data in serialize(chunks, args.export_format):
+            output.write(data)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+ROOT_PARENT_ID = -1
+
+
+def empty_hierarchy() -> pd.DataFrame:
+    return pd.DataFrame(
+        columns=['parent_id', 'size', 'stability', 'lambda_birth', 'topic_id', 'topic_ids'],
+    ).rename_axis('node_id')
+
+
+def build_hierarchy(condensed_tree: Optional[np.ndarray], labels: np.ndarray) -> pd.DataFrame:
+    """Extracts the cluster hierarchy from HDBSCAN's condensed tree.
+
+    Every row is a cluster node with its parent node, size, stability and the birth lambda at which it split off its
+    parent. Nodes that were selected as flat topics have their `topic_id`, and `topic_ids` lists the topics within the
+    subtree of each node, which are the topics that are merged when looking at the node."""
+    if condensed_tree is None or len(condensed_tree) == 0:
+        return empty_hierarchy()
+
+    parents = condensed_tree['parent'].astype(np.int64)
+    children = condensed_tree['child'].astype(np.int64)
+    lambdas = condensed_tree['lambda_val'].astype(np.float64)
+    child_sizes = condensed_tree['child_size'].astype(np.int64)
+
+    # identical points are merged at an infinite lambda, which would make all stabilities infinite
+    finite_lambdas = lambdas[np.isfinite(lambdas)]
+    lambdas = np.where(np.isfinite(lambdas), lambdas, finite_lambdas.max() if len(finite_lambdas) else 0.)
+
+    root = parents.min()
+    is_cluster = child_sizes > 1
+    node_ids = np.concatenate([[root], children[is_cluster]])
+    parent_of = dict(zip(children[is_cluster], parents[is_cluster]))
+    parent_of[root] = ROOT_PARENT_ID
+
+    offset = node_ids - root
+    births = np.zeros(node_ids.max() - root + 1)
+    births[children[is_cluster] - root] = lambdas[is_cluster]
+    sizes = np.zeros(node_ids.max() - root + 1, dtype=np.int64)
+    sizes[0] = root  # all points belong to the root, whose id is the number of points
+    sizes[children[is_cluster] - root] = child_sizes[is_cluster]
+
+    stabilities = np.bincount(parents - root, weights=(lambdas - births[parents - root]) * child_sizes,
+                              minlength=len(births))
+
+    topic_by_node = _selected_nodes(parents, children, is_cluster, parent_of, labels)
+    topic_ids = {node: [] for node in node_ids}
+    for node, topic_id in sorted(topic_by_node.items(), key=lambda item: item[1]):
+        while node != ROOT_PARENT_ID:
+            topic_ids[node].append(topic_id)
+            node = parent_of[node]
+
+    return pd.DataFrame(
+        {
+            'parent_id': [parent_of[node] for node in node_ids],
+            'size': sizes[offset],
+            'stability': stabilities[offset],
+            'lambda_birth': births[offset],
+            'topic_id': [topic_by_node.get(node, -1) for node in node_ids],
+            'topic_ids': [topic_ids[node] for node in node_ids],
+        },
+        index=pd.Index(node_ids, name='node_id'),
+    )
+
+
+def _selected_nodes(parents: np.ndarray, children: np.ndarray, is_cluster: np.ndarray, parent_of: Dict[int, int],
+                    labels: np.ndarray) -> Dict[int, int]:
+    """Finds the tree node of every flat topic. As HDBSCAN labels all points within the subtree of a selected node,
+    the selected node is the lowest common ancestor of the nodes its members fall out of."""
+    leaf_of_point = dict(zip(children[~is_cluster], parents[~is_cluster]))
+    depth = {}
+
+    def depth_of(node):
+        path = [node]
+        while path[-1] not in depth and parent_of[path[-1]] != ROOT_PARENT_ID:
+            path.append(parent_of[path[-1]])
+        depth.setdefault(path[-1], 0)  # unless its depth is known, the last node is the root
+        for child in reversed(path[:-1]):
+            depth[child] = depth[parent_of[child]] + 1
+        return depth[node]
+
+    selected = {}
+    for topic_id in np.unique(labels[labels >= 0]):
+        nodes = {leaf_of_point[point] for point in np.flatnonzero(labels == topic_id) if point in leaf_of_point}
+        while len(nodes) > 1:
+            deepest = max(nodes, key=depth_of)
+            nodes.remove(deepest)
+            nodes.add(parent_of[deepest])
+        if nodes:
+            selected[nodes.pop()] = int(topic_id)
+
+    return selected
@@ -0,0 +1,91 @@
+import importlib
+import itertools
+from functools import lru_cache
+from typing import Dict, List, Iterable, FrozenSet
+
+import numpy as np
+from scipy import sparse
+
+from ri_topics.dedup import normalize_text
+from ri_topics.preprocessing import DEFAULT_LANGUAGE
+from ri_topics.util import LazyModule
+
+sklearn_text = LazyModule('sklearn.feature_extraction.text')
+
+
+@lru_cache(maxsize=None)
+def stop_words(lang: str) -> FrozenSet[str]:
+    """spaCy's stopwords of the language. Without spaCy, English falls back to scikit-learn's stopwords."""
+    try:
+        return frozenset(importlib.import_module(f'spacy.lang.{lang}.stop_words').STOP_WORDS)
+    except ImportError:
+        return frozenset(sklearn_text.ENGLISH_STOP_WORDS) if lang == DEFAULT_LANGUAGE else frozenset()
+
+
+class TopicTermCounts:
+    """Counts how often every term occurs in the tweets of each topic.
+
+    The counts are kept in a sparse topic-term matrix that grows with new topics and terms, so adding tweets only
+    requires tokenizing the new tweets. Keywords are ranked by class-based TF-IDF, which treats all tweets of a topic as
+    a single document. Stopwords are removed according to the language of each tweet."""
+    # counts of an older version were counted differently and have to be counted again
+    VERSION = 2
+
+    def __init__(self):
+        self.version = TopicTermCounts.VERSION
+        self.vocabulary: Dict[str, int] = {}
+        self.rows: Dict[int, int] = {}
+        self.counts = sparse.csr_matrix((0, 0), dtype=np.int64)
+
+    @property
+    def is_current(self) -> bool:
+        # counts pickled before they were versioned have no version
+        return getattr(self, 'version', 1) == TopicTermCounts.VERSION
+
+    def add(self, texts: Iterable[str], labels: Iterable[int], langs: Iterable[str] = None):
+        analyze = sklearn_text.CountVectorizer(preprocessor=normalize_text).build_analyzer()
+        if langs is None:
+            langs = itertools.repeat(DEFAULT_LANGUAGE)
+
+        rows, cols = [], []
+        for text, label, lang in zip(texts, labels, langs):
+            if label < 0:
+                continue
+
+            row = self.rows.setdefault(int(label), len(self.rows))
+            ignored = stop_words(lang if isinstance(lang, str) else DEFAULT_LANGUAGE)
+            for term in analyze(text):
+                if term in ignored:
+                    continue
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+
+        shape = (len(self.rows), len(self.vocabulary))
+        current = self.counts.tocoo()
+        self.counts = sparse.coo_matrix(
+            (np.concatenate([current.data, np.ones(len(rows), dtype=np.int64)]),
+             (np.concatenate([current.row, rows]).astype(int), np.concatenate([current.col, cols]).astype(int))),
+            shape=shape,
+        ).tocsr()
+
+    def keywords(self, n: int = 10) -> Dict[int, List[str]]:
+        if self.counts.nnz == 0:
+            return {label: [] for label in self.rows}
+
+        words_per_topic = np.asarray(self.counts.sum(axis=1)).ravel()
+        term_frequencies = np.asarray(self.counts.sum(axis=0)).ravel()
+        tf = sparse.diags(1 / np.maximum(words_per_topic, 1)) @ self.counts
+        idf = np.log(1 + words_per_topic.mean() / np.maximum(term_frequencies, 1))
+        scores = (tf @ sparse.diags(idf)).tocsr()
+
+        terms = np.empty(len(self.vocabulary), dtype=object)
+        for term, col in self.vocabulary.items():
+            terms[col] = term
+
+        keywords = {}
+        for label, row in self.rows.items():
+            start, stop = scores.indptr[row], scores.indptr[row+1]
+            top = np.argsort(-scores.data[start:stop], kind='stable')[:n]
+            keywords[label] = list(terms[scores.indices[start:stop][top]])
+
+        return keywords
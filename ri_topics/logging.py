@@ -2,7 +2,6 @@ import logging
 import warnings
 from typing import Dict, Union
 
-import numba
 from loguru import logger
 
 
@@ -17,6 +16,8 @@ def setup_logging():
 
 
 def hide_known_warnings():
+    """Imports numba, so the numba cache has to be configured before"""
+    import numba
     warnings.filterwarnings('ignore', category=numba.errors.NumbaPerformanceWarning)
 
 
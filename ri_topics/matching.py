@@ -0,0 +1,88 @@
+import os
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.optimize import linear_sum_assignment
+
+# a new topic is only considered a split of or merge into an old topic if they share this fraction of either's tweets
+LINEAGE_MIN_SHARE = 0.1
+
+
+def empty_lineage() -> pd.DataFrame:
+    return pd.DataFrame(columns=['generation', 'parent_id', 'topic_id', 'shared_tweets', 'jaccard'])
+
+
+@dataclass
+class TopicMatching:
+    """Maps the labels of a refitted clusterer to stable topic ids"""
+    label_map: np.ndarray
+    lineage_df: pd.DataFrame
+    next_topic_id: int
+
+    def relabel(self, labels: np.ndarray) -> np.ndarray:
+        return relabel(labels, self.label_map)
+
+
+def relabel(labels: np.ndarray, label_map: np.ndarray) -> np.ndarray:
+    """Maps cluster labels to topic ids, keeping noise (-1) as it is"""
+    labels = np.asarray(labels)
+    if len(label_map) == 0:
+        return np.full(labels.shape, fill_value=-1, dtype=int)
+
+    return np.where(labels >= 0, label_map[np.maximum(labels, 0)], -1)
+
+
+def match_topics(previous_labels: pd.Series, labels: pd.Series, next_topic_id: int,
+                 min_jaccard: float = None) -> TopicMatching:
+    """Matches new clusters to the previous topics by their shared tweets.
+
+    Both label series are indexed by status id. The overlap of the topics is counted in a sparse contingency table over
+    the tweets labeled in both, so only topic pairs that share tweets are compared. Every new cluster takes over the id
+    of the previous topic with which it has the best one-to-one Jaccard similarity, if that is at least `min_jaccard`
+    (MATCH_MIN_JACCARD, by default 0.3). Remaining clusters get new ids starting at `next_topic_id`. The lineage
+    records which previous topics every new topic shares a considerable part of its tweets with, which shows splits and
+    merges."""
+    if min_jaccard is None:
+        min_jaccard = float(os.getenv('MATCH_MIN_JACCARD', 0.3))
+
+    n_clusters = int(labels.max()) + 1 if len(labels) > 0 else 0
+    common = previous_labels.index.intersection(labels.index)
+    previous = previous_labels.loc[common].values.astype(int)
+    current = labels.loc[common].values.astype(int)
+
+    previous_ids, previous_codes = np.unique(previous[previous >= 0], return_inverse=True)
+    previous_sizes = np.bincount(previous_codes, minlength=len(previous_ids))
+    current_sizes = np.bincount(current[current >= 0], minlength=n_clusters)
+
+    both = (previous >= 0) & (current >= 0)
+    contingency = sparse.coo_matrix(
+        (np.ones(np.sum(both), dtype=np.int64), (np.searchsorted(previous_ids, previous[both]), current[both])),
+        shape=(len(previous_ids), n_clusters),
+    ).tocsr()
+    shared = contingency.tocoo()
+    jaccard = shared.data / (previous_sizes[shared.row] + current_sizes[shared.col] - shared.data)
+
+    label_map = np.full(n_clusters, fill_value=-1, dtype=int)
+    if shared.nnz > 0:
+        similarity = sparse.coo_matrix((jaccard, (shared.row, shared.col)), shape=contingency.shape).toarray()
+        rows, cols = linear_sum_assignment(-similarity)
+        for row, col in zip(rows, cols):
+            if similarity[row, col] >= min_jaccard:
+                label_map[col] = previous_ids[row]
+
+    for col in np.flatnonzero(label_map < 0):
+        label_map[col] = next_topic_id
+        next_topic_id += 1
+
+    is_related = (shared.data >= LINEAGE_MIN_SHARE * previous_sizes[shared.row]) \
+        | (shared.data >= LINEAGE_MIN_SHARE * current_sizes[shared.col])
+    lineage_df = pd.DataFrame({
+        'parent_id': previous_ids[shared.row[is_related]],
+        'topic_id': label_map[shared.col[is_related]],
+        'shared_tweets': shared.data[is_related],
+        'jaccard': jaccard[is_related],
+    }).sort_values(['topic_id', 'parent_id']).reset_index(drop=True)
+
+    return TopicMatching(label_map=label_map, lineage_df=lineage_df, next_topic_id=next_topic_id)
@@ -1,5 +1,6 @@
+import hashlib
 from dataclasses import dataclass
-from typing import List
+from typing import List, Optional, Tuple
 
 from ri_topics.openreq.session import OpenReqServiceSession
 from ri_topics.util import init_from_dicts
@@ -40,6 +41,8 @@ class Tweet:
 class RiStorageTwitter:
     def __init__(self, base_url: str, bearer_token: str):
         self.session = OpenReqServiceSession(base_url, bearer_token)
+        # whether the storage answered with an ETag or 304 Not Modified, so probes of unchanged tweets are cheap
+        self.supports_etags = False
 
     def get_all_account_names(self) -> List[str]:
         response = self.session.get(f'/account_name/all')
@@ -49,3 +52,23 @@ class RiStorageTwitter:
     def get_all_tweets_by_account_name(self, account_name: str) -> List[Tweet]:
         response = self.session.get(f'/account_name/{account_name}/all')
         return init_from_dicts(Tweet, response.json())
+
+    def get_changed_tweets_by_account_name(self, account_name: str, etag: Optional[str] = None) \
+            -> Tuple[Optional[List[Tweet]], Optional[str]]:
+        """Returns the account's tweets unless they are unchanged since the response with the given ETag, which are
+        returned as None, along with the ETag of the current response. If the storage does not send ETags, a hash of
+        the response body is used instead, which still saves processing unchanged tweets but not downloading them."""
+        response = self.session.get(f'/account_name/{account_name}/all',
+                                    headers={'If-None-Match': etag} if etag else None)
+        if response.status_code == 304:
+            self.supports_etags = True
+            return None, etag
+
+        if response.headers.get('ETag'):
+            self.supports_etags = True
+
+        current_etag = response.headers.get('ETag') or hashlib.md5(response.content).hexdigest()
+        if current_etag == etag:
+            return None, etag
+
+        return init_from_dicts(Tweet, response.json()), current_etag
@@ -0,0 +1,78 @@
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple, IO, Iterator
+
+
+@dataclass
+class TopicNameChange:
+    account_name: str
+    topic_id: int
+    name: Optional[str]
+
+
+@contextmanager
+def locked(f: IO, operation: int):
+    fcntl.flock(f, operation)
+    try:
+        yield f
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def fsync_dir(path: Path):
+    """Flushes the entries of a directory to disk, so files that were moved or linked into it survive a crash"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class TopicNamesLog:
+    """Append-only log of topic renames, stored as JSON lines next to a persisted model.
+
+    Renaming a topic only appends a line instead of persisting the whole model. The log is replayed on top of the
+    persisted model when it is loaded and compacted whenever the model is persisted, as the model then includes all
+    names. The file is locked, so several processes can append to and compact the same log."""
+    def __init__(self, path: Path):
+        self.path = path
+
+    def append(self, change: TopicNameChange):
+        with self.path.open(mode='a') as f, locked(f, fcntl.LOCK_EX):
+            f.write(json.dumps(asdict(change)) + '\n')
+
+    def read(self, offset: int = 0) -> Tuple[List[TopicNameChange], int]:
+        """Returns the changes after the byte offset and the offset of the end of the log"""
+        if not self.path.exists():
+            return [], 0
+
+        with self.path.open(mode='r') as f, locked(f, fcntl.LOCK_SH):
+            return self._read(f, offset)
+
+    def size(self) -> int:
+        """The offset of the end of the log. It is smaller than an earlier offset if the log was compacted since."""
+        return self.path.stat().st_size if self.path.exists() else 0
+
+    @contextmanager
+    def compacting(self, offset: int = 0) -> Iterator[List[TopicNameChange]]:
+        """Blocks appending while the model is persisted and empties the log afterwards. Yields the changes after the
+        offset, which have to be applied to the model before persisting it."""
+        with self.path.open(mode='a+') as f, locked(f, fcntl.LOCK_EX):
+            changes, _ = self._read(f, offset)
+            yield changes
+            f.truncate(0)
+
+    @staticmethod
+    def _read(f: IO, offset: int) -> Tuple[List[TopicNameChange], int]:
+        f.seek(offset)
+        lines = f.read()
+        return [TopicNameChange(**json.loads(line)) for line in lines.splitlines() if line], f.tell()
+
+
+def snapshot_version() -> str:
+    return datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
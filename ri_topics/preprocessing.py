@@ -1,24 +1,38 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import List
 
 import numpy as np
-from spacy.lang.en import English
+
+
+DEFAULT_LANGUAGE = 'en'
+# spaCy's language-neutral tokenizer, used for languages without dedicated support
+FALLBACK_LANGUAGE = 'xx'
 
 
 class Sentencizer:
-    def __init__(self):
-        self.nlp = English()
+    def __init__(self, lang: str = DEFAULT_LANGUAGE):
+        import spacy
+
+        try:
+            self.nlp = spacy.blank(lang)
+        except ImportError:
+            self.nlp = spacy.blank(FALLBACK_LANGUAGE)
         self.nlp.add_pipe(self.nlp.create_pipe('sentencizer'))
 
     def split(self, text: str) -> List[str]:
         return [str(sent) for sent in self.nlp(text).sents]
 
 
-class Document:
-    sentencizer = Sentencizer()
+@lru_cache(maxsize=None)
+def get_sentencizer(lang: str = DEFAULT_LANGUAGE) -> Sentencizer:
+    return Sentencizer(lang)
+
 
-    def __init__(self, text):
-        self.sentences = [Sentence(sent) for sent in self.sentencizer.split(text)]
+class Document:
+    def __init__(self, text, lang: str = DEFAULT_LANGUAGE):
+        self.lang = lang if isinstance(lang, str) and lang else FALLBACK_LANGUAGE
+        self.sentences = [Sentence(sent) for sent in get_sentencizer(self.lang).split(text)]
 
     @property
     def embedding(self) -> np.ndarray:
@@ -1,10 +1,12 @@
 import http
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 
-from ri_topics.dtos import Topic
-from ri_topics.topics import TopicModelManager
+from ri_topics.dtos import Topic, Classification, Trend, TopicNode, SearchResult, LineageEdge
+from ri_topics.export import EXPORT_FORMATS, ExportFormatError, check_format, export_chunks, parse_timestamp, serialize
+from ri_topics.topics import TopicModelManager, ModelNotReadyError, UnknownAccountError
+from ri_topics.trends import RESOLUTIONS
 
 
 class RiTopicsApp(Flask):
@@ -15,6 +17,16 @@ app = RiTopicsApp(__name__)
 CORS(app)
 
 
+@app.errorhandler(ModelNotReadyError)
+def model_not_ready(e: ModelNotReadyError):
+    return str(e), http.HTTPStatus.SERVICE_UNAVAILABLE
+
+
+@app.errorhandler(UnknownAccountError)
+def unknown_account(e: UnknownAccountError):
+    return e.args[0], http.HTTPStatus.NOT_FOUND
+
+
 @app.route('/<account_name>/topics/', methods=['GET'])
 def frequent(account_name: str):
     model = app.model_manager.get(account_name)
@@ -31,10 +43,110 @@ def frequent(account_name: str):
 def patch_topic(account_name: str, topic_id: int):
     content = request.get_json()
 
-    model = app.model_manager.get(account_name)
-
     if 'name' in content:
-        model.topic_df.loc[topic_id, 'name'] = content['name']
-        app.model_manager.save(model)
+        app.model_manager.rename_topic(account_name, topic_id, content['name'])
 
     return '', http.HTTPStatus.NO_CONTENT
+
+
+@app.route('/<account_name>/topics/hierarchy', methods=['GET'])
+def topic_hierarchy(account_name: str):
+    """Returns the nodes of the topic hierarchy, or only the children of the node given as `parent` to drill down"""
+    hierarchy_df = app.model_manager.get(account_name).hierarchy_df
+
+    parent_id = request.args.get('parent', type=int)
+    if parent_id is not None:
+        if parent_id not in hierarchy_df.index:
+            return f'Unknown node {parent_id}', http.HTTPStatus.NOT_FOUND
+        hierarchy_df = hierarchy_df[hierarchy_df['parent_id'] == parent_id]
+
+    return jsonify([TopicNode.from_df_tuple(t) for t in hierarchy_df.itertuples()])
+
+
+@app.route('/<account_name>/topics/<int:topic_id>/trend', methods=['GET'])
+def topic_trend(account_name: str, topic_id: int):
+    resolution = request.args.get('resolution', 'day')
+    if resolution not in RESOLUTIONS:
+        return f'Resolution must be one of {", ".join(RESOLUTIONS)}', http.HTTPStatus.BAD_REQUEST
+
+    model = app.model_manager.get(account_name)
+    if topic_id not in model.topic_df.index:
+        return f'Unknown topic {topic_id}', http.HTTPStatus.NOT_FOUND
+
+    counts = model.trends.trend(topic_id, resolution)
+    return jsonify(Trend(
+        topic_id=topic_id,
+        resolution=resolution,
+        timestamps=[timestamp.isoformat() for timestamp in counts.index],
+        counts=counts.tolist(),
+    ))
+
+
+@app.route('/<account_name>/topics/<int:topic_id>/lineage', methods=['GET'])
+def topic_lineage(account_name: str, topic_id: int):
+    """The topics a topic emerged from and passed tweets on to in refits, so ids of retired topics can be followed"""
+    model = app.model_manager.get(account_name)
+    lineage_df = model.lineage(topic_id)
+    if topic_id not in model.topic_df.index and len(lineage_df) == 0:
+        return f'Unknown topic {topic_id}', http.HTTPStatus.NOT_FOUND
+
+    return jsonify([LineageEdge.from_df_tuple(t) for t in lineage_df.itertuples()])
+
+
+@app.route('/<account_name>/classify', methods=['POST'])
+def classify(account_name: str):
+    content = request.get_json()
+    tweets = content.get('tweets') if isinstance(content, dict) else None
+    # texts without any sentences can not be embedded
+    if not tweets or not all(isinstance(tweet, dict) and isinstance(tweet.get('text'), str) and tweet['text'].strip()
+                             for tweet in tweets):
+        return 'Expected a non-empty list of tweets with non-empty texts', http.HTTPStatus.BAD_REQUEST
+
+    if content.get('append'):
+        # classified tweets only become part of the model once an update fetches them from storage
+        return f'Appending is not supported, request an update with POST /{account_name}/update instead', \
+            http.HTTPStatus.BAD_REQUEST
+
+    status_ids = [tweet.get('status_id') for tweet in tweets]
+    assignment = app.model_manager.classify(
+        account_name, [tweet['text'] for tweet in tweets], langs=[tweet.get('lang') for tweet in tweets],
+    )
+
+    return jsonify([
+        Classification(status_id=status_id, label=int(label), probability=float(probability))
+        for status_id, label, probability in zip(status_ids, assignment.labels, assignment.probabilities)
+    ])
+
+
+@app.route('/<account_name>/search', methods=['GET'])
+def search(account_name: str):
+    query = request.args.get('q')
+    if not query:
+        return 'Expected a query q', http.HTTPStatus.BAD_REQUEST
+
+    k = request.args.get('k', default=10, type=int)
+    result_df = app.model_manager.search(account_name, query, k=k, lang=request.args.get('lang'))
+
+    return jsonify([SearchResult.from_df_tuple(t) for t in result_df.itertuples()])
+
+
+@app.route('/<account_name>/update', methods=['POST'])
+def request_update(account_name: str):
+    refit = request.args.get('refit', 'false').lower() in ['1', 'true', 'yes']
+    app.model_manager.request_update(account_name, refit=refit)
+    return '', http.HTTPStatus.ACCEPTED
+
+
+@app.route('/<account_name>/export', methods=['GET'])
+def export(account_name: str):
+    """Streams the account's tweets with their topics as NDJSON, Arrow IPC or Parquet, optionally only those created
+    in [start, end)"""
+    export_format = request.args.get('format', 'ndjson')
+    try:
+        check_format(export_format)
+        start, end = [parse_timestamp(request.args[arg]) if arg in request.args else None for arg in ['start', 'end']]
+    except (ExportFormatError, ValueError) as e:
+        return str(e), http.HTTPStatus.BAD_REQUEST
+
+    chunks = export_chunks([app.model_manager.get(account_name)], start=start, end=end)
+    return Response(stream_with_context(serialize(chunks, export_format)), mimetype=EXPORT_FORMATS[export_format])
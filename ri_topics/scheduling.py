@@ -0,0 +1,130 @@
+import os
+import random
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, TYPE_CHECKING
+
+from loguru import logger
+
+from ri_topics.config import update_intervals
+
+if TYPE_CHECKING:
+    from ri_topics.topics import TopicModelManager
+
+# update requests are checked this often, as they may be made by other processes
+REQUEST_POLL_SECONDS = 5
+# accounts are listed by the storage, so new accounts are picked up this often or when an update is requested for them
+MODEL_KEYS_REFRESH_SECONDS = 300
+# without ETags, every probe downloads all tweets of the model's accounts, so models are only probed daily by default
+DEFAULT_INTERVAL_MINUTES = 24 * 60
+CHEAP_PROBE_INTERVAL_MINUTES = 60
+
+
+class UpdateScheduler:
+    """Updates the models of accounts that have new tweets.
+
+    Every model is probed in its own interval (UPDATE_INTERVAL_MINUTES, or UPDATE_INTERVALS per model) plus a random
+    jitter of up to UPDATE_JITTER_MINUTES, so the accounts are not all fetched at once. Probes are conditional requests,
+    so unchanged accounts are neither processed nor, if the storage supports ETags, downloaded. Unless configured, the
+    interval is hourly once the storage answered with ETags and daily before, as each probe is a full download then.
+    Due models with new tweets are updated largest backlog first, reusing the probed tweets. Requested updates are
+    probed right away and requested refits are fitted to all tweets right away."""
+    def __init__(self, manager: 'TopicModelManager', interval_minutes: float = None, jitter_minutes: float = None,
+                 intervals: Dict[str, float] = None):
+        if interval_minutes is None and os.getenv('UPDATE_INTERVAL_MINUTES'):
+            interval_minutes = float(os.getenv('UPDATE_INTERVAL_MINUTES'))
+        if jitter_minutes is None:
+            jitter_minutes = float(os.getenv('UPDATE_JITTER_MINUTES', 5))
+        if intervals is None:
+            intervals = update_intervals()
+
+        self.manager = manager
+        self.interval_seconds = interval_minutes * 60 if interval_minutes is not None else None
+        self.jitter_seconds = jitter_minutes * 60
+        self.interval_seconds_by_key = {key: minutes * 60 for key, minutes in intervals.items()}
+
+        self.etags: Dict[str, Optional[str]] = {}
+        self.next_probe_at: Dict[str, float] = {}
+        self._model_keys: Optional[List[str]] = None
+        self._model_keys_refreshed_at = 0.
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'UpdateScheduler':
+        self._thread = threading.Thread(target=self._run, name='UpdateScheduler')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+
+    def run_pending(self, now: float = None) -> List[str]:
+        """Refits the models with requested refits, probes the due models and updates those with new tweets.
+        Returns the keys of the refitted and updated models."""
+        now = time.time() if now is None else now
+        requested = self.manager.pop_update_requests()
+        model_keys = self._get_model_keys(now, required=requested)
+        refitted_keys = []
+        for key, refit in requested.items():
+            if refit and key in model_keys:
+                try:
+                    self.manager.refit(key)
+                    refitted_keys.append(key)
+                except Exception:
+                    logger.exception(f'Refitting {key} failed')
+
+        # the first probes after starting are only spread by the jitter
+        due_keys = [
+            key for key in model_keys
+            if key not in refitted_keys
+            and (key in requested or self.next_probe_at.setdefault(key, now + self._jitter()) <= now)
+        ]
+
+        backlogs = {}
+        for key in due_keys:
+            try:
+                backlogs[key] = self.manager.probe_new_tweets(key, self.etags)
+            except Exception:
+                logger.exception(f'Probing {key} for new tweets failed')
+            # the default interval depends on whether the probes showed that the storage supports ETags
+            self.next_probe_at[key] = now + self._interval_seconds(key) + self._jitter()
+
+        updated_keys = refitted_keys
+        for key, (new_tweet_df, etags) in sorted(backlogs.items(), key=lambda item: len(item[1][0]), reverse=True):
+            if len(new_tweet_df) > 0:
+                logger.info(f'Updating {key} with a backlog of {len(new_tweet_df)} tweets')
+                try:
+                    self.manager.update_model(key, new_tweet_df)
+                    updated_keys.append(key)
+                except Exception:
+                    logger.exception(f'Updating {key} failed')
+                    continue
+            # only once the tweets are processed, they may be skipped as unchanged
+            self.etags.update(etags)
+
+        return updated_keys
+
+    def _get_model_keys(self, now: float, required: Iterable[str] = ()) -> List[str]:
+        """The keys of all models, which are listed again after MODEL_KEYS_REFRESH_SECONDS or if required keys are
+        missing, e.g. those of accounts that were added since"""
+        if self._model_keys is None or now >= self._model_keys_refreshed_at + MODEL_KEYS_REFRESH_SECONDS \
+                or not set(required) <= set(self._model_keys):
+            self._model_keys, self._model_keys_refreshed_at = self.manager.model_keys, now
+
+        return self._model_keys
+
+    def _interval_seconds(self, key: str) -> float:
+        if key in self.interval_seconds_by_key:
+            return self.interval_seconds_by_key[key]
+        if self.interval_seconds is not None:
+            return self.interval_seconds
+
+        return (CHEAP_PROBE_INTERVAL_MINUTES if self.manager.probes_are_cheap else DEFAULT_INTERVAL_MINUTES) * 60
+
+    def _jitter(self) -> float:
+        return random.uniform(0, self.jitter_seconds)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.run_pending()
+            self._stopped.wait(REQUEST_POLL_SECONDS)
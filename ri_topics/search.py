@@ -0,0 +1,80 @@
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from ri_topics.centroids import normalize_rows
+
+
+class VectorIndex:
+    """Normalized tweet embeddings for exact cosine similarity search.
+
+    The vectors live in a raw float32 file next to the persisted model and are only memory-mapped when searched, so
+    the indices of many accounts do not have to be held in memory. New vectors are appended to the end of the file.
+    The pickled index only contains the file name and the status ids of the vectors, so the directory of the file can be
+    moved and the unpickled index has to be `relocate`d to it."""
+    def __init__(self, path: Path):
+        self.path = path
+        self.status_ids = np.array([], dtype=object)
+        self.dim: Optional[int] = None
+        self._vectors: Optional[np.ndarray] = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_vectors'] = None
+        state['path'] = Path(self.path.name)
+        return state
+
+    def relocate(self, directory: Path):
+        """Resolves the file of an unpickled index in the directory it is stored in now"""
+        self.path = directory / self.path.name
+        self._vectors = None
+
+    def __len__(self):
+        return len(self.status_ids)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None or len(self._vectors) != len(self):
+            if len(self) == 0:
+                return np.empty((0, self.dim or 0), dtype=np.float32)
+            self._vectors = np.memmap(self.path, dtype=np.float32, mode='r', shape=(len(self), self.dim))
+
+        return self._vectors
+
+    def add(self, status_ids, embeddings: np.ndarray):
+        if len(embeddings) == 0:
+            return
+
+        self.dim = self.dim or embeddings.shape[1]
+        vectors = normalize_rows(np.asarray(embeddings, dtype=np.float32))
+
+        self._vectors = None
+        with self.path.open(mode='ab') as f:
+            # drop vectors of an earlier add whose model was never persisted
+            f.truncate(len(self) * self.dim * vectors.itemsize)
+            f.write(np.ascontiguousarray(vectors).tobytes())
+
+        self.status_ids = np.concatenate([self.status_ids, np.asarray(status_ids, dtype=object)])
+
+    def search(self, query: np.ndarray, k: int = 10, mask: np.ndarray = None,
+               chunk_size: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the status ids and similarities of the k vectors most similar to the query. If given, only vectors
+        where `mask` is true are considered."""
+        if len(self) == 0:
+            return np.array([], dtype=object), np.array([], dtype=np.float32)
+
+        query = normalize_rows(np.asarray(query, dtype=np.float32).reshape(1, -1))[0]
+        vectors = self.vectors
+        scores = np.empty(len(self), dtype=np.float32)
+        for start in range(0, len(self), chunk_size):
+            scores[start:start+chunk_size] = vectors[start:start+chunk_size] @ query
+
+        if mask is not None:
+            scores[~mask] = -np.inf
+
+        k = min(k, int(np.sum(np.isfinite(scores))))
+        top = np.argpartition(-scores, k - 1)[:k] if k > 0 else np.array([], dtype=int)
+        top = top[np.argsort(-scores[top], kind='stable')]
+
+        return self.status_ids[top], scores[top]
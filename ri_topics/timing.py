@@ -0,0 +1,37 @@
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+from loguru import logger
+
+
+@contextmanager
+def log_duration(description: str):
+    start = time.perf_counter()
+    yield
+    logger.info(f'{description} took {time.perf_counter() - start:0.2f}s')
+
+
+class PhaseTimer:
+    """Records the durations of consecutive phases, e.g. of the service startup"""
+    def __init__(self, name: str):
+        self.name = name
+        self.start = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, phase_name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[phase_name] = time.perf_counter() - start
+            logger.info(f'{self.name}: {phase_name} took {self.durations[phase_name]:0.2f}s')
+
+    @property
+    def total(self) -> float:
+        return time.perf_counter() - self.start
+
+    def log_summary(self):
+        phases = ', '.join(f'{name} {duration:0.2f}s' for name, duration in self.durations.items())
+        logger.info(f'{self.name} took {self.total:0.2f}s ({phases})')
@@ -1,20 +1,30 @@
 import dataclasses
-import pickle
+import os
 import threading
-import time
+import uuid
 from pathlib import Path
-from schedule import Scheduler
-from typing import List, Optional, Callable, Dict
+from typing import List, Optional, Callable, Dict, Tuple, Union
 
+import joblib
 import numpy as np
 import pandas as pd
 import pandas.io.json
 from loguru import logger
 
+from ri_topics.batching import MicroBatcher
 from ri_topics.clustering import Clusterer, ClusterAssignment
-from ri_topics.config import MODEL_DIR
+from ri_topics.config import MODEL_DIR, env_flag, account_groups, languages
+from ri_topics.cost_model import current_memory_mb
+from ri_topics.dedup import deduplicate
 from ri_topics.embedder import Embedder
+from ri_topics.hierarchy import build_hierarchy, empty_hierarchy
+from ri_topics.keywords import TopicTermCounts
+from ri_topics.matching import TopicMatching, match_topics, empty_lineage
 from ri_topics.openreq.ri_storage_twitter import RiStorageTwitter, Tweet
+from ri_topics.persistence import TopicNamesLog, TopicNameChange, fsync_dir, snapshot_version
+from ri_topics.scheduling import UpdateScheduler
+from ri_topics.search import VectorIndex
+from ri_topics.trends import TopicTrends
 from ri_topics.util import df_without, default_value, pct
 
 
@@ -33,7 +43,8 @@ def tweets_to_df(tweets: List[Tweet]):
         df = pd.io.json.json_normalize(dicts)
         df['sentiment'] = df['sentiment'].astype('category')
         df['tweet_class'] = df['tweet_class'].astype('category')
-        df['created_at'] = pd.to_datetime(df['created_at_full'])
+        # stored as naive UTC timestamps, which take 8 bytes per tweet
+        df['created_at'] = pd.to_datetime(df['created_at_full'], utc=True).dt.tz_localize(None)
         df = df.drop(columns=['created_at_full'])
         with_idx = df.set_index('status_id')
         return with_idx
@@ -46,64 +57,268 @@ def tweets_to_df(tweets: List[Tweet]):
 
 
 class TopicModel:
-    persisted_tweet_attributes = ['label',  'probability'] + []
-    persisted_representative_attributes = ['representative_id'] + ['text', 'name']
+    persisted_tweet_attributes = ['label',  'probability'] + ['created_at', 'account_name']
+    persisted_representative_attributes = ['representative_id'] + ['text', 'name', 'keywords']
 
-    def __init__(self, account_name, clusterer_factory: Callable[[], Clusterer] = Clusterer):
+    def __init__(self, account_name, clusterer_factory: Callable[[], Clusterer] = Clusterer,
+                 member_accounts: List[str] = None):
+        """A model is fitted over the tweets of all its `member_accounts`. By default, that is only the account it is
+        named after. Shared models of multiple accounts serve each account through an AccountView."""
         self.account_name = account_name
+        self.member_accounts = member_accounts or [account_name]
 
         self.clusterer = clusterer_factory()
+        # name of the SBERT model that embedded the tweets, None for models persisted before it was recorded
+        self.embedding_model: Optional[str] = None
         self.tweet_df: Optional[pd.DataFrame] = None
         self.topic_df: Optional[pd.DataFrame] = None
-
-    def train(self, embedder: Embedder, storage: RiStorageTwitter):
+        self.term_counts = TopicTermCounts()
+        # whether the term counts and trends include all tweets, which they do not for models persisted before them
+        self.rollups_complete = True
+        self.trends = TopicTrends()
+        self.hierarchy_df = empty_hierarchy()
+        self.vector_index = VectorIndex(MODEL_DIR / f'{account_name}.{uuid.uuid4().hex}.vectors')
+
+        # ids of topics that are new in a refit start at next_topic_id, so ids of earlier topics are never reused
+        self.next_topic_id = 0
+        self.generation = 0
+        self.lineage_df = empty_lineage()
+
+        # representatives, names and trends of each member account of a shared model
+        self.account_topic_dfs: Dict[str, pd.DataFrame] = {}
+        self.account_trends: Dict[str, TopicTrends] = {}
+
+    def __setstate__(self, state):
+        # fill attributes that did not exist yet when the model was pickled
+        self.__init__(state['account_name'], clusterer_factory=lambda: None)
+        self.__dict__.update(state)
+        # the models directory may have moved since the model was pickled, e.g. into a container
+        self.vector_index.relocate(MODEL_DIR)
+        if self.topic_df is not None and 'keywords' not in self.topic_df:
+            self.topic_df['keywords'] = [[] for _ in self.topic_df.index]
+        if self.tweet_df is not None and 'account_name' in self.tweet_df:
+            self.tweet_df = self._with_account_categories(self.tweet_df)
+        if 'term_counts' not in state or not self.term_counts.is_current:
+            # the terms of models persisted before term counts existed or with other stopwords are counted again
+            self.term_counts = TopicTermCounts()
+            self.rollups_complete = False
+        if self.tweet_df is not None and not {'created_at', 'account_name'} <= set(self.tweet_df.columns):
+            # models persisted before the creation times of tweets were kept have no trends of their earlier tweets
+            self.rollups_complete = False
+
+    def train(self, embedder: Embedder, storage: RiStorageTwitter, previous: 'TopicModel' = None):
+        """Fits the model to all tweets of its accounts. When refitting a `previous` model, the new topics are matched
+        to the previous ones, so that matched topics keep their ids and names."""
         logger.info(f'Training model {self.account_name}')
+        self.embedding_model = embedder.model_name
+        fitted: Dict[str, ClusterAssignment] = {}
+
+        def fit(embeddings: np.ndarray) -> ClusterAssignment:
+            fitted['assignment'] = self.clusterer.fit(embeddings)
+            return fitted['assignment']
 
         full_tweet_df = self._get_new_tweets(storage)
-        labeled_tweet_df = self._process_tweets(full_tweet_df, embedder, assign=self.clusterer.fit)
-        self.tweet_df = labeled_tweet_df[TopicModel.persisted_tweet_attributes]
+        labeled_tweet_df, embedded_ids, embeddings = self._process_tweets(full_tweet_df, embedder, assign=fit)
+        tree_labels = fitted['assignment'].tree_labels
+        if previous is not None:
+            matching = self._match_topics(previous, labeled_tweet_df['label'])
+            labeled_tweet_df['label'] = matching.relabel(labeled_tweet_df['label'])
+            tree_labels = matching.relabel(tree_labels)
+        self.next_topic_id = max(self.next_topic_id, int(np.max(labeled_tweet_df['label'].values, initial=-1)) + 1)
+        self.hierarchy_df = build_hierarchy(fitted['assignment'].condensed_tree, tree_labels)
+
+        self.vector_index.add(embedded_ids, embeddings)
+        self.tweet_df = self._with_account_categories(labeled_tweet_df[TopicModel.persisted_tweet_attributes])
 
         topic_df = select_representatives(labeled_tweet_df)
         topic_df['name'] = None
-        self.topic_df = topic_df[TopicModel.persisted_representative_attributes]
+        topic_df['keywords'] = None
+        self.topic_df = topic_df[TopicModel.persisted_representative_attributes].copy()
+        self._add_to_rollups(labeled_tweet_df)
+        if previous is not None:
+            self._carry_names(previous)
 
         n_assigned = np.sum(self.tweet_df['label'] >= 0)
         logger.info(f'Assigned {n_assigned} ({n_assigned/len(self.tweet_df):0.01%}) tweets '
                     f'into {len(self.topic_df)} clusters')
 
-    def update(self, embedder: Embedder, storage: RiStorageTwitter):
+    def _match_topics(self, previous: 'TopicModel', labels: pd.Series) -> TopicMatching:
+        matching = match_topics(
+            previous.tweet_df['label'],
+            labels,
+            # models persisted before topics were matched do not know their next topic id
+            next_topic_id=max(previous.next_topic_id, int(np.max(previous.tweet_df['label'].values, initial=-1)) + 1),
+        )
+        self.clusterer.label_map = matching.label_map
+        self.next_topic_id = matching.next_topic_id
+        self.generation = previous.generation + 1
+        self.lineage_df = previous.lineage_df.append(matching.lineage_df.assign(generation=self.generation),
+                                                     ignore_index=True, sort=False)
+
+        n_matched = len(set(matching.label_map) & set(previous.topic_df.index))
+        logger.info(f'Matched {n_matched} of {len(matching.label_map)} topics to the {len(previous.topic_df)} '
+                    f'previous topics')
+        return matching
+
+    def _carry_names(self, previous: 'TopicModel'):
+        """Takes over the names of matched topics"""
+        topic_dfs = [(self.topic_df, previous.topic_df)] + [
+            (topic_df, previous.account_topic_dfs[account_name])
+            for account_name, topic_df in self.account_topic_dfs.items() if account_name in previous.account_topic_dfs
+        ]
+        for topic_df, previous_topic_df in topic_dfs:
+            names = previous_topic_df['name'].to_dict()
+            topic_df['name'] = [names.get(label) for label in topic_df.index]
+
+    def lineage(self, topic_id: int) -> pd.DataFrame:
+        """The refits in which the topic emerged from or passed on tweets to other topics"""
+        return self.lineage_df[(self.lineage_df['topic_id'] == topic_id) | (self.lineage_df['parent_id'] == topic_id)]
+
+    def update(self, embedder: Embedder, storage: RiStorageTwitter, full_tweet_df: pd.DataFrame = None):
+        """Assigns new tweets to the topics. Unless they were already fetched, the new tweets are fetched from storage."""
         logger.info(f'Predicting new tweets for {self.account_name}')
 
-        full_tweet_df = self._get_new_tweets(storage)
-        update_df = self._process_tweets(full_tweet_df, embedder, assign=self.clusterer.predict)
+        if full_tweet_df is None:
+            full_tweet_df = self._get_new_tweets(storage)
+        update_df, embedded_ids, embeddings = self._process_tweets(full_tweet_df, embedder,
+                                                                   assign=self.clusterer.predict)
+        self.vector_index.add(embedded_ids, embeddings)
         self._log_assignment_rate(update_df)
-        self.tweet_df = self.tweet_df.append(update_df[TopicModel.persisted_tweet_attributes])
+        self.tweet_df = self._with_account_categories(
+            self.tweet_df.append(update_df[TopicModel.persisted_tweet_attributes])
+        )
+        self._add_to_rollups(update_df)
+
+    def rebuild_rollups(self, storage: RiStorageTwitter):
+        """Counts the terms and trends of all tweets of the model again. Only the labels of tweets are persisted, so the
+        tweets are fetched again, which also fills in their creation times and accounts if they were not persisted."""
+        logger.info(f'Rebuilding the term counts and trends of the tweets of {self.account_name}')
+        all_tweet_df = self._tweets_df(self._fetch_tweets(storage))
+        known_df = all_tweet_df[all_tweet_df.index.isin(self.tweet_df.index)]
+        for column in ['created_at', 'account_name']:
+            if column not in self.tweet_df:
+                self.tweet_df[column] = known_df[column].reindex(self.tweet_df.index)
+        self.tweet_df = self._with_account_categories(self.tweet_df)
+
+        self.term_counts = TopicTermCounts()
+        self.trends = TopicTrends()
+        self.account_trends = {}
+        self._add_to_rollups(known_df.assign(label=self.tweet_df['label'].reindex(known_df.index)))
+        self.rollups_complete = True
 
-    def _get_new_tweets(self, storage: RiStorageTwitter) -> pd.DataFrame:
-        logger.info(f'Fetching tweets for {self.account_name}')
-        tweets = storage.get_all_tweets_by_account_name(self.account_name)
-        df = df_without(tweets_to_df(tweets), self.tweet_df)
+    @property
+    def is_shared(self) -> bool:
+        return self.member_accounts != [self.account_name]
+
+    def view(self, account_name: str) -> Union['TopicModel', 'AccountView']:
+        """The view of a member account. The model itself is the merged view of all its members."""
+        if account_name == self.account_name:
+            return self
+        if account_name not in self.member_accounts:
+            raise UnknownAccountError(f'{account_name} is not a member of the topic model {self.account_name}')
+
+        return AccountView(self, account_name)
+
+    def new_tweets(self, tweets_by_account: Dict[str, List[Tweet]]) -> pd.DataFrame:
+        """The fetched tweets of member accounts which the model has not processed yet"""
+        df = df_without(self._tweets_df(tweets_by_account), self.tweet_df)
         logger.info(f'Retrieved {len(df)} new tweets')
 
         return df
 
-    def _process_tweets(self, full_tweet_df: pd.DataFrame, embedder: Embedder, assign: Callable[[np.ndarray], ClusterAssignment]) -> pd.DataFrame:
-        language_mask = full_tweet_df['lang'] == 'en'
-        account_mask = full_tweet_df['user_name'] != self.account_name
+    @staticmethod
+    def _tweets_df(tweets_by_account: Dict[str, List[Tweet]]) -> pd.DataFrame:
+        account_dfs = []
+        for account_name, tweets in tweets_by_account.items():
+            account_df = tweets_to_df(tweets)
+            account_df['account_name'] = account_name
+            account_dfs.append(account_df)
+
+        all_df = pd.concat(account_dfs)
+        # tweets addressing multiple member accounts are only kept once
+        return all_df[~all_df.index.duplicated(keep='first')]
+
+    def _fetch_tweets(self, storage: RiStorageTwitter) -> Dict[str, List[Tweet]]:
+        tweets_by_account = {}
+        for account_name in self.member_accounts:
+            logger.info(f'Fetching tweets for {account_name}')
+            tweets_by_account[account_name] = storage.get_all_tweets_by_account_name(account_name)
+
+        return tweets_by_account
+
+    def _get_new_tweets(self, storage: RiStorageTwitter) -> pd.DataFrame:
+        return self.new_tweets(self._fetch_tweets(storage))
+
+    @staticmethod
+    def _with_account_categories(tweet_df: pd.DataFrame) -> pd.DataFrame:
+        """Stores the account names of the tweets as categories, which take one byte instead of a string per tweet.
+        Appending tweets of accounts that are not among the categories yet falls back to strings, hence the cast."""
+        if isinstance(tweet_df['account_name'].dtype, pd.CategoricalDtype):
+            return tweet_df
+
+        return tweet_df.assign(account_name=tweet_df['account_name'].astype('category'))
+
+    def _process_tweets(self, full_tweet_df: pd.DataFrame, embedder: Embedder, assign: Callable[[np.ndarray], ClusterAssignment]) -> Tuple[pd.DataFrame, pd.Index, np.ndarray]:
+        """Filters, deduplicates, embeds and assigns the tweets. Returns the labeled tweets and the embeddings of the
+        representatives of the duplicate groups with their status ids, so duplicates are only indexed once."""
+        allowed_languages = languages()
+        language_mask = full_tweet_df['lang'].isin(allowed_languages) if allowed_languages is not None \
+            else pd.Series(True, index=full_tweet_df.index)
+        account_mask = ~full_tweet_df['user_name'].isin(self.member_accounts)
         filtered_tweet_df = full_tweet_df[language_mask & account_mask]
         n_discarded = len(full_tweet_df) - len(filtered_tweet_df)
         logger.info(f'Discarding {n_discarded} ({pct(n_discarded, len(full_tweet_df)):0.01%}) tweets')
+        discarded_languages = full_tweet_df.loc[~language_mask, 'lang'].fillna('unknown').value_counts()
+        if len(discarded_languages) > 0:
+            logger.info(f'Tweets discarded per language: {discarded_languages.to_dict()}')
+
+        dedup = deduplicate(filtered_tweet_df['text'], near_duplicates=env_flag('DEDUP_NEAR_DUPLICATES'))
+        n_duplicates = len(filtered_tweet_df) - dedup.n_unique
+        logger.info(f'Collapsing {n_duplicates} ({pct(n_duplicates, len(filtered_tweet_df)):0.01%}) duplicate tweets')
+        unique_texts = filtered_tweet_df['text'].iloc[dedup.representative_idxs]
 
-        embeddings = embedder.embed_texts(filtered_tweet_df['text'])
+        unique_langs = filtered_tweet_df['lang'].iloc[dedup.representative_idxs]
+
+        embeddings = embedder.embed_texts(list(unique_texts), langs=list(unique_langs))
         logger.info('Assigning tweets to clusters')
         assignment = assign(embeddings)
 
         logger.info(f'Processing clusters')
         update_df = filtered_tweet_df.copy()
-        update_df['label'] = assignment.labels
-        update_df['probability'] = assignment.probabilities
+        update_df['label'] = dedup.fan_out(assignment.labels)
+        update_df['probability'] = dedup.fan_out(assignment.probabilities)
+
+        return update_df, filtered_tweet_df.index[dedup.representative_idxs], embeddings
 
-        return update_df
+    def _add_to_rollups(self, labeled_df: pd.DataFrame):
+        self.term_counts.add(labeled_df['text'], labeled_df['label'], labeled_df['lang'])
+        self.trends.add(labeled_df['created_at'], labeled_df['label'])
+
+        if self.is_shared:
+            for account_name in self.member_accounts:
+                account_df = labeled_df[labeled_df['account_name'] == account_name]
+                self.account_trends.setdefault(account_name, TopicTrends()) \
+                    .add(account_df['created_at'], account_df['label'])
+                self._add_account_topics(account_name, account_df)
+
+        self._update_keywords()
+
+    def _add_account_topics(self, account_name: str, account_df: pd.DataFrame):
+        """Selects representatives for topics which the account has not had tweets in before"""
+        current_df = self.account_topic_dfs.get(account_name)
+        topic_df = select_representatives(account_df)
+        if current_df is not None:
+            topic_df = topic_df.drop(current_df.index, errors='ignore')
+
+        topic_df['name'] = None
+        topic_df['keywords'] = None
+        topic_df = topic_df[TopicModel.persisted_representative_attributes].copy()
+        self.account_topic_dfs[account_name] = topic_df if current_df is None else current_df.append(topic_df)
+
+    def _update_keywords(self, n: int = 10):
+        keywords = self.term_counts.keywords(n)
+        for topic_df in [self.topic_df, *self.account_topic_dfs.values()]:
+            topic_df['keywords'] = [keywords.get(label, []) for label in topic_df.index]
 
     def _log_assignment_rate(self, df: pd.DataFrame):
         n_unassigned = np.sum(df['label'] == -1)
@@ -115,80 +330,390 @@ class TopicModel:
         )
 
 
+class AccountView:
+    """The tweets and topics of one member account of a shared topic model. Topic ids are the same for all members,
+    but representatives, names and trends are the account's own."""
+    def __init__(self, model: TopicModel, account_name: str):
+        self.model = model
+        self.account_name = account_name
+
+    @property
+    def clusterer(self) -> Clusterer:
+        return self.model.clusterer
+
+    @property
+    def tweet_df(self) -> pd.DataFrame:
+        tweet_df = self.model.tweet_df
+        return tweet_df[tweet_df['account_name'] == self.account_name]
+
+    @property
+    def topic_df(self) -> pd.DataFrame:
+        # accounts that joined the group after the last update do not have topics yet
+        if self.account_name not in self.model.account_topic_dfs:
+            self.model.account_topic_dfs[self.account_name] = pd.DataFrame(
+                columns=TopicModel.persisted_representative_attributes,
+            ).rename_axis('label')
+        return self.model.account_topic_dfs[self.account_name]
+
+    @property
+    def trends(self) -> TopicTrends:
+        return self.model.account_trends.setdefault(self.account_name, TopicTrends())
+
+    @property
+    def embedding_model(self) -> Optional[str]:
+        return self.model.embedding_model
+
+    @property
+    def hierarchy_df(self) -> pd.DataFrame:
+        return self.model.hierarchy_df
+
+    @property
+    def vector_index(self) -> VectorIndex:
+        return self.model.vector_index
+
+    def lineage(self, topic_id: int) -> pd.DataFrame:
+        return self.model.lineage(topic_id)
+
+
+class ModelNotReadyError(LookupError):
+    """Raised by serving-only managers for models that have not been trained yet"""
+
+
+class UnknownAccountError(KeyError):
+    """Raised for accounts that are neither a member of a model nor a model of their own"""
+
+
 class TopicModelManager:
-    def __init__(self, embedder: Embedder, storage: RiStorageTwitter):
+    """Trains, updates and persists the topic models and keeps them in memory.
+
+    Persisted models are replaced atomically and reloaded as soon as the persisted file changes, so several processes
+    can share the models directory. Serving-only managers never train or update models themselves but serve the models
+    published by a trainer process."""
+    def __init__(self, embedder: Embedder, storage: RiStorageTwitter, serving_only: bool = False):
         self.models = {}
         self.embedder = embedder
         self.storage = storage
+        self.serving_only = serving_only
+        self._versions: Dict[str, int] = {}
+        self._name_offsets: Dict[str, int] = {}
+        self.account_groups = account_groups()
+        self._group_by_account = {
+            account_name: group for group, account_names in self.account_groups.items() for account_name in account_names
+        }
+        self._locks: Dict[str, threading.Lock] = {}
+        self.classifier = MicroBatcher(
+            self._classify_batch,
+            max_batch_size=int(os.getenv('CLASSIFY_MAX_BATCH_SIZE', 64)),
+            max_wait_seconds=int(os.getenv('CLASSIFY_MAX_WAIT_MS', 10)) / 1000,
+        )
 
-    def get(self, account_name: str) -> TopicModel:
-        if account_name not in self.models:
-            if self._is_persisted(account_name):
-                self._cache(self._load(account_name))
-            else:
-                self.save(self._build(account_name))
+    def get(self, account_name: str) -> Union[TopicModel, AccountView]:
+        """Returns the account's model, or its view of the shared model if the account is part of a group"""
+        model = self._get_model(self._model_key(account_name))
+        return model.view(account_name) if model.is_shared else model
 
-        return self.models[account_name]
+    def save(self, model: Union[TopicModel, AccountView]):
+        if isinstance(model, AccountView):
+            model = model.model
 
-    def save(self, model: TopicModel):
         self._cache(model)
         self._persist(model)
 
-    def prepare_all(self):
-        for name in self.model_names:
-            self.get(name)  # "touch" the model to initialize it
-
-    def update_all(self):
-        for name in self.model_names:
-            self.save(self._update(name))
-
-    def schedule_updates(self) -> threading.Event:
-        scheduler = Scheduler()
-        scheduler.every().day.at('04:30').do(self.update_all)
+    def rename_topic(self, account_name: str, topic_id: int, name: Optional[str]):
+        """Renames a topic by appending to the model's names log, which is cheaper than persisting the model"""
+        key = self._model_key(account_name)
+        self._get_model(key)
+        self._names_log(key).append(TopicNameChange(account_name=account_name, topic_id=topic_id, name=name))
+        self._replay_names(key)
+
+    def classify(self, account_name: str, texts: List[str], langs: List[Optional[str]] = None) -> ClusterAssignment:
+        """Assigns texts in the given languages to the account's topics. Concurrent calls are embedded and predicted in
+        shared batches."""
+        model = self._get_comparable(account_name)
+        return self.classifier.submit((model, texts, langs or [None] * len(texts))).result()
+
+    def search(self, account_name: str, query: str, k: int = 10, lang: str = None) -> pd.DataFrame:
+        """Finds the k tweets of the account that are most similar to the query in the given language"""
+        model = self._get_comparable(account_name)
+        index = model.vector_index
+        mask = np.isin(index.status_ids, model.tweet_df.index) if isinstance(model, AccountView) else None
+
+        query_embedding = self.embedder.embed_texts([query], show_progess=False, langs=[lang], use_pool=False)[0]
+        status_ids, scores = index.search(query_embedding, k=k, mask=mask)
+
+        return pd.DataFrame({
+            'score': scores,
+            'label': model.tweet_df['label'].reindex(status_ids).fillna(-1).astype(int).values,
+        }, index=pd.Index(status_ids, name='status_id'))
 
-        cease_run = threading.Event()
-
-        class ScheduleThread(threading.Thread):
-            def run(self) -> None:
-                while not cease_run.is_set():
-                    scheduler.run_pending()
-                    time.sleep(1)
+    def prepare_all(self):
+        for key in self.model_keys:
+            self._get_model(key)  # "touch" the model to initialize it
 
-        schedule_thread = ScheduleThread()
-        schedule_thread.start()
+    def load_persisted(self):
+        """Loads all persisted models without training the missing ones"""
+        for key in self.model_keys:
+            if self._is_persisted(key):
+                self._get_model(key)
 
-        return cease_run
+    def update_all(self):
+        for key in self.model_keys:
+            self.update_model(key)
+
+    def update_model(self, key: str, full_tweet_df: pd.DataFrame = None):
+        self.save(self._update(key, full_tweet_df))
+
+    def refit(self, key: str):
+        """Fits a new model to all tweets, whose topics are matched to those of the current model"""
+        self.save(self._refit(self._get_model(key)))
+
+    def probe_new_tweets(self, key: str, etags: Dict[str, Optional[str]]) -> Tuple[pd.DataFrame, Dict[str, str]]:
+        """Fetches the tweets of the model's accounts that changed since the responses with the given ETags.
+        Returns the tweets the model has not processed yet and the ETags of the current responses."""
+        model = self._get_model(key)
+        tweets_by_account, current_etags = {}, {}
+        for account_name in model.member_accounts:
+            tweets, current_etags[account_name] = \
+                self.storage.get_changed_tweets_by_account_name(account_name, etags.get(account_name))
+            if tweets is not None:
+                tweets_by_account[account_name] = tweets
+
+        if not tweets_by_account:
+            return pd.DataFrame(), current_etags
+
+        return model.new_tweets(tweets_by_account), current_etags
+
+    def schedule_updates(self) -> UpdateScheduler:
+        return UpdateScheduler(self).start()
+
+    def request_update(self, account_name: str, refit: bool = False):
+        """Requests the scheduler to update or refit the account's model. This also works from other processes, e.g.
+        serving workers, as requests are files in the models directory."""
+        if self._model_key(account_name) not in self.model_keys:
+            raise UnknownAccountError(f'Unknown account {account_name}')
+
+        trigger_dir = MODEL_DIR / 'update_requests'
+        trigger_dir.mkdir(exist_ok=True)
+        trigger_path = trigger_dir / self._model_key(account_name)
+        if refit:
+            trigger_path.write_text('refit')
+        else:
+            trigger_path.touch()
+
+    def pop_update_requests(self) -> Dict[str, bool]:
+        """Returns whether a refit was requested for each model with requested updates"""
+        requests = {}
+        for path in (MODEL_DIR / 'update_requests').glob('*'):
+            requests[path.name] = path.read_text() == 'refit'
+            path.unlink()
+
+        return requests
 
     @property
     def model_names(self) -> List[str]:
         return self.storage.get_all_account_names()
 
-    def _build(self, account_name: str) -> TopicModel:
-        logger.info(f'Building model for {account_name}')
-        model = TopicModel(account_name)
+    @property
+    def probes_are_cheap(self) -> bool:
+        """Whether the storage answered probes with ETags, so that probing unchanged accounts downloads no tweets"""
+        return self.storage.supports_etags
+
+    @property
+    def model_keys(self) -> List[str]:
+        """Names under which the models are stored: the group name for grouped accounts, else the account name"""
+        return list(dict.fromkeys(self._model_key(name) for name in self.model_names))
+
+    def _model_key(self, account_name: str) -> str:
+        return self._group_by_account.get(account_name, account_name)
+
+    def _get_model(self, key: str) -> TopicModel:
+        if key not in self.models or self._is_changed(key):
+            with self._locks.setdefault(key, threading.Lock()):
+                if key not in self.models or self._is_changed(key):
+                    if self._is_persisted(key):
+                        model = self._load(key)
+                        # accounts may have been added to or removed from the group since the model was persisted
+                        model.member_accounts = self.account_groups.get(key) or [key]
+                        if self._embeds_differently(model) and not self.serving_only:
+                            logger.info(f'{key} was embedded with the SBERT model {model.embedding_model}')
+                            self.save(self._refit(model))
+                        elif not model.rollups_complete and not self.serving_only:
+                            model.rebuild_rollups(self.storage)
+                            self.save(model)
+                        else:
+                            self._cache(model)
+                    elif self.serving_only:
+                        raise ModelNotReadyError(f'No model has been trained for {key} yet')
+                    else:
+                        self.save(self._build(key))
+
+        self._replay_names(key)
+        return self.models[key]
+
+    def _build(self, key: str) -> TopicModel:
+        logger.info(f'Building model for {key}')
+        model = TopicModel(key, member_accounts=self.account_groups.get(key))
         model.train(embedder=self.embedder, storage=self.storage)
         return model
 
-    def _update(self, account_name: str) -> TopicModel:
+    def _refit(self, previous: TopicModel) -> TopicModel:
+        logger.info(f'Refitting model for {previous.account_name}')
+        model = TopicModel(previous.account_name, member_accounts=self.account_groups.get(previous.account_name))
+        model.train(embedder=self.embedder, storage=self.storage, previous=previous)
+        return model
+
+    def _embeds_differently(self, model: Union[TopicModel, AccountView]) -> bool:
+        """Whether the model's tweets were embedded with another SBERT model than the current one, whose embeddings
+        can not be compared to theirs"""
+        model_name = self.embedder.model_name
+        return isinstance(model_name, str) and model.embedding_model != model_name
+
+    def _get_comparable(self, account_name: str) -> Union[TopicModel, AccountView]:
+        """Returns the account's model unless new texts would be embedded into another space than its tweets, which
+        is the case until the trainer refitted it for a new SBERT model"""
         model = self.get(account_name)
-        model.update(self.embedder, self.storage)
+        if self._embeds_differently(model):
+            raise ModelNotReadyError(f'The model of {account_name} is being refitted for the SBERT model '
+                                     f'{self.embedder.model_name}')
+
+        return model
+
+    def _update(self, key: str, full_tweet_df: pd.DataFrame = None) -> TopicModel:
+        model = self._get_model(key)
+        model.update(self.embedder, self.storage, full_tweet_df)
         return model
 
+    def _classify_batch(self, requests: List[Tuple[Union[TopicModel, AccountView], List[str], List[Optional[str]]]]) -> List[ClusterAssignment]:
+        texts = [text for _, request_texts, _ in requests for text in request_texts]
+        langs = [lang for _, _, request_langs in requests for lang in request_langs]
+        # classification has to be fast, so it never waits for the pool of encoding workers
+        embeddings = self.embedder.embed_texts(texts, show_progess=False, langs=langs, use_pool=False)
+        offsets = np.cumsum([0] + [len(request_texts) for _, request_texts, _ in requests])
+
+        labels = np.full(len(texts), fill_value=-1, dtype=int)
+        probabilities = np.zeros(len(texts))
+        clusterers = {id(model.clusterer): model.clusterer for model, _, _ in requests}
+        for clusterer_id, clusterer in clusterers.items():
+            idxs = np.concatenate([
+                np.arange(offsets[i], offsets[i+1])
+                for i, (model, _, _) in enumerate(requests) if id(model.clusterer) == clusterer_id
+            ])
+            assignment = clusterer.predict(embeddings[idxs], allow_fast_path=True)
+            labels[idxs] = assignment.labels
+            probabilities[idxs] = assignment.probabilities
+
+        return [
+            ClusterAssignment(labels=labels[start:stop], probabilities=probabilities[start:stop])
+            for start, stop in zip(offsets[:-1], offsets[1:])
+        ]
+
     def _cache(self, model: TopicModel):
         self.models[model.account_name] = model
 
     def _persist(self, model: TopicModel):
-        logger.info(f'Persisting model for {model.account_name}')
-        with self._path(model.account_name).open(mode='wb+') as f:
-            pickle.dump(model, f)
+        """Writes a new snapshot of the model and atomically links it as the current model, so readers in other
+        processes never see a partially written model. The model includes all names, so the names log is compacted."""
+        key = model.account_name
+        logger.info(f'Persisting model for {key}')
+        snapshot_dir = self._snapshot_dir(key)
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        # snapshots are named after their vector index, so pruning does not have to load them
+        snapshot_path = snapshot_dir / f'{snapshot_version()}.{model.vector_index.path.stem}.pickle'
+
+        with self._names_log(key).compacting(self._name_offsets.get(key, 0)) as changes:
+            for change in changes:
+                self._apply_name(model, change)
+
+            tmp_path = snapshot_path.with_name(f'.{snapshot_path.name}.tmp')
+            with tmp_path.open(mode='wb+') as f:
+                joblib.dump(model, f)
+                # the data has to be on disk before it is renamed, or a crash could leave an empty snapshot behind
+                f.flush()
+                os.fsync(f.fileno())
+            tmp_path.replace(snapshot_path)
+            fsync_dir(snapshot_dir)
+
+            path = self._path(key)
+            tmp_path = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+            os.link(snapshot_path, tmp_path)
+            tmp_path.replace(path)
+            fsync_dir(path.parent)
+
+        self._name_offsets[key] = 0
+        self._versions[key] = self._version(key)
+        self._prune_snapshots(model)
+
+    def _prune_snapshots(self, model: TopicModel):
+        """Removes all but the newest MODEL_SNAPSHOTS snapshots and the vector indices they no longer reference"""
+        key = model.account_name
+        snapshots = sorted(self._snapshot_dir(key).glob('*.pickle'))
+        n_retained = max(1, int(os.getenv('MODEL_SNAPSHOTS', 3)))
+        for snapshot in snapshots[:-n_retained]:
+            snapshot.unlink()
+
+        referenced = {model.vector_index.path.name} | {
+            snapshot.name.split('.', 1)[1][:-len('.pickle')] + '.vectors'
+            for snapshot in snapshots[-n_retained:]
+        }
+        for path in MODEL_DIR.glob(f'{key}.*.vectors'):
+            if path.name not in referenced:
+                path.unlink()
 
     def _load(self, account_name: str) -> TopicModel:
         logger.info(f'Loading persisted model for {account_name}')
-        with self._path(account_name).open(mode='rb') as f:
-            return pickle.load(f)
+        self._versions[account_name] = self._version(account_name)
+        self._name_offsets[account_name] = 0
+        memory_before = current_memory_mb()
+        # serving processes map the numeric arrays of the model, e.g. the labels of tweets and the training data of
+        # UMAP, copy-on-write from the file, so that all processes serving the model share them through the page cache
+        model = joblib.load(self._path(account_name), mmap_mode='c' if self.serving_only else None)
+
+        # object arrays like status ids and texts are still a private copy of every process
+        memory_after = current_memory_mb()
+        logger.info(f'Resident memory of process {os.getpid()} is {memory_after:.0f} MB after loading {account_name} '
+                    f'({memory_after - memory_before:+.0f} MB)')
+        return model
+
+    def _replay_names(self, key: str):
+        """Applies renames that were appended to the names log since it was last read, e.g. by other processes"""
+        names_log = self._names_log(key)
+        if names_log.size() == self._name_offsets.get(key, 0):
+            return
+
+        with self._locks.setdefault(key, threading.Lock()):
+            if names_log.size() < self._name_offsets.get(key, 0):
+                # another process compacted the log, so it persisted a model that includes the names
+                self._cache(self._load(key))
+
+            changes, self._name_offsets[key] = names_log.read(self._name_offsets[key])
+            for change in changes:
+                self._apply_name(self.models[key], change)
+
+    @staticmethod
+    def _apply_name(model: TopicModel, change: TopicNameChange):
+        topic_df = model.view(change.account_name).topic_df if model.is_shared else model.topic_df
+        if change.topic_id in topic_df.index:
+            topic_df.loc[change.topic_id, 'name'] = change.name
+
+    def _version(self, account_name: str) -> Optional[int]:
+        try:
+            return self._path(account_name).stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _is_changed(self, account_name: str) -> bool:
+        """Whether the persisted model was replaced by another process since it was loaded"""
+        version = self._version(account_name)
+        return version is not None and version != self._versions.get(account_name)
 
     def _is_persisted(self, account_name: str) -> bool:
         return self._path(account_name).exists()
 
     def _path(self, account_name: str) -> Path:
         return MODEL_DIR / f'{account_name}.pickle'
+
+    def _snapshot_dir(self, account_name: str) -> Path:
+        return MODEL_DIR / 'snapshots' / account_name
+
+    def _names_log(self, account_name: str) -> TopicNamesLog:
+        return TopicNamesLog(MODEL_DIR / f'{account_name}.names.jsonl')
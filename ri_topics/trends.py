@@ -0,0 +1,36 @@
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+RESOLUTIONS = {
+    'day': 'D',
+    'hour': 'H',
+}
+
+
+class TopicTrends:
+    """Number of tweets per topic and day or hour.
+
+    The counts are rolled up whenever tweets are added and stored as gapless series, so reading a trend does not touch
+    any tweets."""
+    def __init__(self):
+        self.counts: Dict[str, Dict[int, pd.Series]] = {resolution: {} for resolution in RESOLUTIONS}
+
+    def add(self, created_at: pd.Series, labels: pd.Series):
+        df = pd.DataFrame({'created_at': pd.to_datetime(np.asarray(created_at)), 'label': np.asarray(labels)}).dropna()
+        df = df[df['label'] >= 0]
+
+        for resolution, freq in RESOLUTIONS.items():
+            buckets = df['created_at'].dt.floor(freq)
+            for label, batch_counts in df.groupby([df['label'], buckets]).size().groupby(level=0):
+                batch_counts = batch_counts.droplevel(0)
+                series = self.counts[resolution].get(int(label))
+                if series is not None:
+                    batch_counts = series.add(batch_counts, fill_value=0)
+
+                full_range = pd.date_range(batch_counts.index.min(), batch_counts.index.max(), freq=freq)
+                self.counts[resolution][int(label)] = batch_counts.reindex(full_range, fill_value=0).astype(np.int64)
+
+    def trend(self, label: int, resolution: str = 'day') -> pd.Series:
+        return self.counts[resolution].get(label, pd.Series([], dtype=np.int64))
@@ -1,6 +1,9 @@
 import dataclasses
+import importlib
 import math
-from typing import List, Any, Dict, Optional
+import threading
+from types import ModuleType
+from typing import List, Any, Dict, Optional, Callable
 from unittest.mock import Mock
 
 import pandas as pd
@@ -68,3 +71,34 @@ def pct(a, b) -> float:
         return a / b
     else:
         return math.inf
+
+
+class LazyModule:
+    """Stands in for a module whose import is deferred until one of its attributes is first accessed"""
+    def __init__(self, name: str, on_load: Callable[[ModuleType], None] = None):
+        self._name = name
+        self._on_load = on_load
+        self._module: Optional[ModuleType] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._module is not None
+
+    def __getattr__(self, attr: str):
+        if attr.startswith('_'):
+            # introspection (e.g. by mock or asyncio) must not trigger the import
+            raise AttributeError(attr)
+
+        return getattr(self._load(), attr)
+
+    def _load(self) -> ModuleType:
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    module = importlib.import_module(self._name)
+                    if self._on_load is not None:
+                        self._on_load(module)
+                    self._module = module
+
+        return self._module
@@ -0,0 +1,89 @@
+import os
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable
+
+import numpy as np
+from loguru import logger
+
+from ri_topics.clustering import Clusterer
+from ri_topics.config import DATA_DIR
+
+NUMBA_CACHE_DIR = DATA_DIR / 'numba_cache'
+
+
+@dataclass
+class WarmupReport:
+    cold_seconds: float
+    warm_seconds: float
+
+    @property
+    def compile_seconds(self) -> float:
+        """Time spent on JIT compilation in the cold run"""
+        return max(0., self.cold_seconds - self.warm_seconds)
+
+
+def configure_numba_cache(cache_dir: Path = NUMBA_CACHE_DIR):
+    """Lets numba cache compiled kernels on disk. Has to be called before numba is imported, because numba only reads
+    NUMBA_CACHE_DIR on import. An explicitly set NUMBA_CACHE_DIR takes precedence.
+
+    Only kernels declared with cache=True are cached. UMAP 0.3.10 declares none and HDBSCAN is compiled with Cython,
+    so with the pinned versions every process still compiles UMAP's kernels, which is what `warm_up` is for."""
+    if 'numba' in sys.modules:
+        logger.warning('numba is already imported, the numba cache directory can not be configured anymore')
+        return
+
+    cache_dir = Path(os.environ.setdefault('NUMBA_CACHE_DIR', str(cache_dir)))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    logger.info(f'Caching cacheable numba kernels in {cache_dir}')
+
+
+def warm_up(n_samples: int = 300, embedding_dim: int = 64) -> float:
+    """Fits and predicts with a clusterer on a tiny synthetic data set, so that the numba kernels of UMAP are compiled in
+    this process before the first real request. Processes forked afterwards inherit the compiled kernels. Returns the
+    seconds it took."""
+    random = np.random.RandomState(0)
+    centers = random.normal(scale=10, size=(5, embedding_dim))
+    embeddings = (centers[np.arange(n_samples) % len(centers)] + random.normal(size=(n_samples, embedding_dim))) \
+        .astype(np.float32)
+
+    start = time.perf_counter()
+    clusterer = Clusterer()
+    clusterer.fit(embeddings)
+    clusterer.predict(embeddings[:10])
+    seconds = time.perf_counter() - start
+
+    logger.info(f'Numba warm-up took {seconds:0.2f}s')
+    return seconds
+
+
+def benchmark(sample_sizes: Iterable[int] = (300, 5000), embedding_dim: int = 64) -> WarmupReport:
+    """Compares a cold and a warm run of the warm-up for each sample size. UMAP uses different kernels for small and
+    large data sets, hence both sizes. Only meant to be run on its own, as the larger fit takes a while."""
+    def run() -> float:
+        return sum(warm_up(n_samples, embedding_dim) for n_samples in sample_sizes)
+
+    report = WarmupReport(cold_seconds=run(), warm_seconds=run())
+    logger.info(f'The cold run took {report.cold_seconds:0.2f}s, of which {report.compile_seconds:0.2f}s were spent '
+                f'compiling kernels')
+    return report
+
+
+if __name__ == '__main__':
+    import argparse
+    from ri_topics.logging import setup_logging
+
+    parser = argparse.ArgumentParser(description='Measures how long compiling the numba kernels of UMAP takes')
+    parser.add_argument('--benchmark', action='store_true', help='compare a cold and a warm run')
+    args = parser.parse_args()
+
+    configure_numba_cache()
+    setup_logging()
+    if args.benchmark:
+        benchmark()
+    else:
+        # UMAP uses different kernels for small and large data sets
+        for n_samples in [300, 5000]:
+            warm_up(n_samples)
@@ -81,6 +81,21 @@ class RiStorageTwitterTest(unittest.TestCase):
         req.get(base_url + '/account_name/A/all', text=tweets_response, request_headers=request_headers)
         self.assertEqual(tweets, self.storage.get_all_tweets_by_account_name('A'))
 
+    @requests_mock.mock()
+    def test_changed_tweets(self, req):
+        req.get(base_url + '/account_name/A/all', text=tweets_response, request_headers=request_headers)
+        changed_tweets, etag = self.storage.get_changed_tweets_by_account_name('A')
+        self.assertEqual(tweets, changed_tweets)
+
+        self.assertEqual((None, etag), self.storage.get_changed_tweets_by_account_name('A', etag))
+        self.assertFalse(self.storage.supports_etags)
+
+    @requests_mock.mock()
+    def test_changed_tweets_not_modified(self, req):
+        req.get(base_url + '/account_name/A/all', status_code=304, request_headers={'If-None-Match': '"v1"'})
+        self.assertEqual((None, '"v1"'), self.storage.get_changed_tweets_by_account_name('A', '"v1"'))
+        self.assertTrue(self.storage.supports_etags)
+
 
 if __name__ == '__main__':
     unittest.main()
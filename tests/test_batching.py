@@ -0,0 +1,47 @@
+import unittest
+from unittest.mock import Mock
+
+from ri_topics.batching import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_items_are_batched(self):
+        process_batch = Mock(side_effect=lambda items: [item * 2 for item in items])
+        batcher = MicroBatcher(process_batch, max_batch_size=5, max_wait_seconds=1)
+
+        futures = [batcher.submit(item) for item in range(5)]
+
+        self.assertEqual([0, 2, 4, 6, 8], [future.result(timeout=5) for future in futures])
+        self.assertEqual(1, process_batch.call_count)
+
+    def test_batch_size_is_limited(self):
+        process_batch = Mock(side_effect=lambda items: items)
+        batcher = MicroBatcher(process_batch, max_batch_size=2, max_wait_seconds=1)
+
+        futures = [batcher.submit(item) for item in range(5)]
+
+        self.assertEqual(list(range(5)), [future.result(timeout=5) for future in futures])
+        self.assertTrue(all(len(call[0][0]) <= 2 for call in process_batch.call_args_list))
+
+    def test_errors_are_propagated(self):
+        batcher = MicroBatcher(Mock(side_effect=ValueError('Failed')))
+
+        with self.assertRaises(ValueError):
+            batcher.submit(1).result(timeout=5)
+
+    def test_errors_are_isolated(self):
+        def process_batch(items):
+            if 2 in items:
+                raise ValueError('Failed')
+            return items
+
+        batcher = MicroBatcher(process_batch, max_batch_size=5, max_wait_seconds=1)
+        futures = [batcher.submit(item) for item in range(5)]
+
+        with self.assertRaises(ValueError):
+            futures[2].result(timeout=5)
+        self.assertEqual([0, 1, 3, 4], [futures[i].result(timeout=5) for i in [0, 1, 3, 4]])
+
+
+if __name__ == '__main__':
+    unittest.main()
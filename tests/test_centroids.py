@@ -0,0 +1,43 @@
+import unittest
+
+import numpy as np
+
+from ri_topics.centroids import CentroidIndex
+
+embedding_dim = 32
+n_clusters = 4
+
+
+def blobs(n_samples: int, random: np.random.RandomState):
+    centers = random.normal(size=(n_clusters, embedding_dim))
+    labels = np.arange(n_samples) % n_clusters
+    embeddings = centers[labels] + random.normal(scale=0.1, size=(n_samples, embedding_dim))
+    return centers, embeddings, labels
+
+
+class TestCentroidIndex(unittest.TestCase):
+    def setUp(self):
+        self.random = np.random.RandomState(42)
+        self.centers, self.embeddings, self.labels = blobs(200, self.random)
+
+    def test_assigns_to_closest_centroid(self):
+        index = CentroidIndex.build(self.embeddings, self.labels)
+        self.assertEqual(1.0, index.agreement)
+
+        labels, probabilities = index.assign(self.centers)
+        np.testing.assert_equal(labels, np.arange(n_clusters))
+        np.testing.assert_array_less(0.9, probabilities)
+
+    def test_dissimilar_embeddings_are_noise(self):
+        index = CentroidIndex.build(self.embeddings, self.labels)
+
+        labels, probabilities = index.assign(-self.centers)
+        np.testing.assert_equal(labels, [-1] * n_clusters)
+        np.testing.assert_equal(probabilities, [0.] * n_clusters)
+
+    def test_noise_only(self):
+        self.assertIsNone(CentroidIndex.build(self.embeddings, np.full(len(self.embeddings), -1)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,7 +4,9 @@ from unittest.mock import Mock
 
 import numpy as np
 
-from ri_topics.clustering import Clusterer, ClustererParams
+from ri_topics.centroids import CentroidIndex
+from ri_topics.clustering import Clusterer, ClustererParams, FitStrategy
+from ri_topics.cost_model import ResourceBudget
 
 embedding_dim = 768
 n_labels = 5
@@ -33,6 +35,31 @@ class TestClusterer(unittest.TestCase):
         np.testing.assert_equal(fit_assignment.labels, labels)
         np.testing.assert_equal(fit_assignment.probabilities, probabilities)
 
+    @mock.patch.dict('os.environ', {'CLUSTERING_MEMORY_BUDGET_MB': '100'})
+    @mock.patch('ri_topics.clustering.hdbscan')
+    @mock.patch('ri_topics.clustering.umap')
+    def test_fit_subsample(self, umap, hdbscan):
+        n_samples = 5000
+        embeddings = np.random.random((n_samples, embedding_dim)).astype(np.float32)
+
+        umap.UMAP.side_effect = lambda n_components, *args, **kwargs: Mock(**{
+            'fit_transform.side_effect': lambda x: np.random.random((len(x), n_components)),
+            'transform.side_effect': lambda x: np.random.random((len(x), n_components)),
+        })
+
+        def fit_hdbscan(x):
+            hdbscan.HDBSCAN.return_value.labels_ = np.arange(len(x)) % n_labels
+            hdbscan.HDBSCAN.return_value.probabilities_ = np.ones(len(x))
+        hdbscan.HDBSCAN.return_value.fit.side_effect = fit_hdbscan
+        hdbscan.approximate_predict.side_effect = lambda model, x: (np.zeros(len(x), dtype=int), np.full(len(x), 0.5))
+
+        assignment = Clusterer().fit(embeddings)
+        n_fitted = len(assignment.sample_idxs)
+        self.assertLess(n_fitted, n_samples)
+        self.assertEqual(n_samples, len(assignment.labels))
+        np.testing.assert_equal(assignment.tree_labels, np.arange(n_fitted) % n_labels)
+        self.assertEqual(n_samples - n_fitted, np.sum(assignment.probabilities == 0.5))
+
     @mock.patch('ri_topics.clustering.hdbscan')
     @mock.patch('ri_topics.clustering.umap')
     def test_predict(self, umap, hdbscan):
@@ -54,6 +81,47 @@ class TestClusterer(unittest.TestCase):
         np.testing.assert_equal(fit_assignment.labels, labels)
         np.testing.assert_equal(fit_assignment.probabilities, probabilities)
 
+    @mock.patch('ri_topics.clustering.hdbscan')
+    @mock.patch('ri_topics.clustering.umap')
+    def test_predict_scales_like_fit(self, umap, hdbscan):
+        n_samples = 100
+        embeddings = np.random.random((n_samples, embedding_dim)) * 10 + 5
+
+        umap.UMAP.return_value.fit_transform.side_effect = lambda x: np.random.random((len(x), 2))
+        umap.UMAP.return_value.transform.side_effect = lambda x: np.random.random((len(x), 2))
+        hdbscan.HDBSCAN.return_value.configure_mock(**{
+            'labels_': np.arange(n_samples) % n_labels,
+            'probabilities_': np.ones(n_samples),
+        })
+        hdbscan.approximate_predict.side_effect = lambda model, x: (np.zeros(len(x), dtype=int), np.ones(len(x)))
+
+        clusterer = Clusterer()
+        clusterer.fit(embeddings)
+        clusterer.predict(embeddings[:10], allow_fast_path=False)
+
+        fitted = umap.UMAP.return_value.fit_transform.call_args[0][0]
+        predicted = umap.UMAP.return_value.transform.call_args[0][0]
+        np.testing.assert_allclose(fitted[:10], predicted)
+
+    @mock.patch('ri_topics.clustering.hdbscan')
+    @mock.patch('ri_topics.clustering.umap')
+    def test_predict_fast_path(self, umap, hdbscan):
+        n_samples = 100
+
+        labels = np.arange(n_samples) % n_labels
+        centers = np.random.random((n_labels, embedding_dim)) - 0.5
+        embeddings = centers[labels] + np.random.normal(scale=0.01, size=(n_samples, embedding_dim))
+
+        clusterer = Clusterer()
+        clusterer.hdbscan = hdbscan.HDBSCAN()
+        clusterer.umap = umap.UMAP()
+        clusterer.centroid_index = CentroidIndex.build(embeddings, labels)
+
+        fast_assignment = clusterer.predict(embeddings, allow_fast_path=True)
+        np.testing.assert_equal(fast_assignment.labels, labels)
+        self.assertFalse(umap.UMAP.return_value.transform.called)
+        self.assertFalse(hdbscan.approximate_predict.called)
+
     @mock.patch('ri_topics.clustering.hdbscan')
     @mock.patch('ri_topics.clustering.umap')
     def test_fit_empty_data(self, umap, hdbscan):
@@ -74,5 +142,33 @@ class TestClusterer(unittest.TestCase):
         np.testing.assert_equal(fit_assignment.probabilities, [0.] * 10)
 
 
+class TestFitStrategy(unittest.TestCase):
+    def test_unlimited_budget(self):
+        strategy = FitStrategy.choose(50000, embedding_dim, ResourceBudget())
+        self.assertEqual('full', strategy.name)
+        self.assertEqual(50000, strategy.sample_size)
+
+    def test_time_budget(self):
+        full = FitStrategy.choose(50000, embedding_dim, ResourceBudget())
+        strategy = FitStrategy.choose(50000, embedding_dim, ResourceBudget(seconds=0.9 * full.estimate.seconds))
+        self.assertEqual('reduced_components', strategy.name)
+        self.assertLess(strategy.params.n_components, full.params.n_components)
+
+    def test_degraded_strategy_warns(self):
+        with mock.patch('ri_topics.clustering.logger') as logger:
+            FitStrategy.choose(50000, embedding_dim, ResourceBudget())
+            self.assertFalse(logger.warning.called)
+
+            FitStrategy.choose(50000, embedding_dim, ResourceBudget(memory_mb=500))
+            self.assertTrue(logger.warning.called)
+
+    def test_memory_budget(self):
+        budget = ResourceBudget(memory_mb=500)
+        strategy = FitStrategy.choose(50000, embedding_dim, budget)
+        self.assertEqual('subsample', strategy.name)
+        self.assertLess(strategy.sample_size, 50000)
+        self.assertTrue(budget.allows(strategy.estimate))
+
+
 if __name__ == '__main__':
     unittest.main()
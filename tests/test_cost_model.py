@@ -0,0 +1,38 @@
+import unittest
+from unittest import mock
+
+from ri_topics.clustering import ClustererParams
+from ri_topics.cost_model import ResourceBudget, estimate_fit_cost, CostEstimate
+
+embedding_dim = 768
+
+
+class TestCostModel(unittest.TestCase):
+    def test_estimate_grows_with_sample_size(self):
+        estimates = [estimate_fit_cost(n, embedding_dim, ClustererParams.for_sample_size(n)) for n in [5000, 50000, 500000]]
+        for smaller, larger in zip(estimates, estimates[1:]):
+            self.assertLess(smaller.peak_memory_mb, larger.peak_memory_mb)
+            self.assertLess(smaller.seconds, larger.seconds)
+
+    def test_subsample_holds_all_embeddings(self):
+        params = ClustererParams.for_sample_size(5000)
+        subsample = estimate_fit_cost(5000, embedding_dim, params, n_total=500000)
+        self.assertGreater(subsample.peak_memory_mb, estimate_fit_cost(5000, embedding_dim, params).peak_memory_mb)
+
+    def test_budget(self):
+        budget = ResourceBudget(memory_mb=100, seconds=10)
+        self.assertTrue(budget.allows(CostEstimate(peak_memory_mb=50, seconds=5)))
+        self.assertFalse(budget.allows(CostEstimate(peak_memory_mb=150, seconds=5)))
+        self.assertFalse(budget.allows(CostEstimate(peak_memory_mb=50, seconds=15)))
+
+    @mock.patch.dict('os.environ', {'CLUSTERING_MEMORY_BUDGET_MB': '2048', 'CLUSTERING_TIME_BUDGET_S': '600'})
+    def test_budget_from_env(self):
+        self.assertEqual(ResourceBudget(memory_mb=2048, seconds=600), ResourceBudget.from_env())
+
+    @mock.patch.dict('os.environ', {'CLUSTERING_MEMORY_BUDGET_MB': '', 'CLUSTERING_TIME_BUDGET_S': ''})
+    def test_unconfigured_budget_from_env(self):
+        self.assertEqual(ResourceBudget(), ResourceBudget.from_env())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+
+import numpy as np
+
+from ri_topics.dedup import deduplicate, normalize_text
+
+
+class TestNormalizeText(unittest.TestCase):
+    def test_removes_noise(self):
+        self.assertEqual(
+            'my versa keeps rebooting',
+            normalize_text('RT @FitbitSupport My Versa keeps   rebooting!!! https://t.co/abc'),
+        )
+
+
+class TestDeduplicate(unittest.TestCase):
+    texts = [
+        'My Versa keeps rebooting after the update',
+        'my versa keeps rebooting after the update!',
+        'The app does not sync with my phone',
+        '@FitbitSupport my Versa keeps rebooting after the update',
+        'My Versa keeps rebooting after the latest update',
+    ]
+
+    def test_exact_duplicates(self):
+        dedup = deduplicate(self.texts)
+        np.testing.assert_equal(dedup.representative_idxs, [0, 2, 4])
+        np.testing.assert_equal(dedup.fan_out(dedup.representative_idxs), [0, 0, 2, 0, 4])
+
+    def test_near_duplicates(self):
+        dedup = deduplicate(self.texts, near_duplicates=True)
+        self.assertEqual(2, dedup.n_unique)
+        self.assertEqual(dedup.inverse[0], dedup.inverse[4])
+        self.assertNotEqual(dedup.inverse[0], dedup.inverse[2])
+
+    def test_texts_without_words_are_kept_apart(self):
+        dedup = deduplicate(['https://t.co/abc', '@FitbitSupport', '!!!'], near_duplicates=True)
+        self.assertEqual(3, dedup.n_unique)
+
+    def test_near_duplicates_in_large_buckets(self):
+        texts = [f'my versa number {idx} keeps rebooting after the update' for idx in range(300)]
+        dedup = deduplicate(texts + [texts[0] + ' again'], near_duplicates=True)
+        self.assertEqual(dedup.inverse[0], dedup.inverse[-1])
+
+    def test_empty(self):
+        self.assertEqual(0, deduplicate([]).n_unique)
+
+
+if __name__ == '__main__':
+    unittest.main()
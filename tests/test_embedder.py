@@ -4,7 +4,7 @@ from unittest.mock import Mock
 import numpy as np
 from sentence_transformers import SentenceTransformer
 
-from ri_topics.embedder import Embedder
+from ri_topics.embedder import Embedder, ParallelEncoder
 
 EMBEDDING_DIM = 768
 
@@ -12,7 +12,8 @@ EMBEDDING_DIM = 768
 class TestEmbedder(unittest.TestCase):
     def setUp(self) -> None:
         self.mock_transformer = Mock(spec=SentenceTransformer, **{
-            'encode.side_effect': lambda sents, *args, **kwargs: np.random.random((len(sents), EMBEDDING_DIM))
+            'encode.side_effect': lambda sents, *args, **kwargs: np.random.random((len(sents), EMBEDDING_DIM)),
+            'get_sentence_embedding_dimension.return_value': EMBEDDING_DIM,
         })
 
     def test_embed_texts(self):
@@ -24,6 +25,33 @@ class TestEmbedder(unittest.TestCase):
         ])
         self.assertEqual((3, EMBEDDING_DIM), embeddings.shape)
 
+    def test_embed_texts_per_language(self):
+        self.mock_transformer.encode.side_effect = lambda sents, *args, **kwargs: \
+            np.array([[len(sent)] * EMBEDDING_DIM for sent in sents])
+
+        texts = ['Mein Akku ist leer.', 'My battery is empty.', 'Ma batterie est vide.', 'Het werkt niet.']
+        embeddings = Embedder(model=self.mock_transformer).embed_texts(texts, langs=['de', 'en', 'fr', 'nl'])
+        np.testing.assert_equal(embeddings[:, 0], [len(text) for text in texts])
+
+    def test_parallel_encoder(self):
+        sentences = [f'Sentence {idx}' for idx in range(50)]
+        self.mock_transformer.encode.side_effect = lambda sents, *args, **kwargs: \
+            np.array([[int(sent.split()[-1])] * EMBEDDING_DIM for sent in sents])
+
+        encoder = ParallelEncoder(self.mock_transformer, n_workers=2, chunk_size=8, capacity=20)
+        self.addCleanup(encoder.close)
+        # the pool is reused and longer inputs are encoded in windows of the buffer's capacity
+        np.testing.assert_equal(encoder.encode(sentences)[:, 0], np.arange(50))
+        np.testing.assert_equal(encoder.encode(sentences[:5])[:, 0], np.arange(5))
+
+    def test_small_inputs_are_encoded_in_process(self):
+        embedder = Embedder(model=self.mock_transformer, n_workers=2, pool_min_sentences=10)
+        embedder.start_workers()
+        self.addCleanup(embedder._pool.close)
+
+        embedder.embed_texts(['A single sentence'])
+        self.assertEqual(1, self.mock_transformer.encode.call_count)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+import importlib.util
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+from unittest.mock import Mock
+
+import pandas as pd
+
+from ri_topics.export import export_chunks, serialize, check_format, parse_timestamp, ExportFormatError, main
+from ri_topics.topics import TopicModel, TopicModelManager
+
+has_pyarrow = importlib.util.find_spec('pyarrow') is not None
+
+
+def get_model() -> TopicModel:
+    model = TopicModel(account_name='FitbitSupport')
+    model.tweet_df = pd.DataFrame(
+        {
+            'label': [0, 1, -1, 0],
+            'probability': [1.0, 0.8, 0.0, 0.6],
+            'created_at': pd.to_datetime(['2020-01-01 10:00', '2020-01-02 10:00', '2020-01-03 10:00', '2020-01-04']),
+            'account_name': 'FitbitSupport',
+        },
+        index=pd.Index(['0', '1', '2', '3'], name='status_id'),
+    )
+    model.topic_df = pd.DataFrame(
+        {
+            'representative_id': ['0', '1'],
+            'text': ['Text for cluster 0', 'Text for cluster 1'],
+            'name': ['Battery', None],
+            'keywords': [['battery', 'charging'], ['sync']],
+        },
+        index=pd.Index([0, 1], name='label'),
+    )
+    return model
+
+
+class TestExport(unittest.TestCase):
+    def test_export_chunks(self):
+        chunks = list(export_chunks([get_model()], chunk_size=3))
+
+        self.assertEqual([3, 1], [len(chunk) for chunk in chunks])
+        export_df = pd.concat(chunks)
+        self.assertEqual(['0', '1', '2', '3'], list(export_df['status_id']))
+        self.assertEqual(['Battery', None, None, 'Battery'], list(export_df['topic_name']))
+        self.assertEqual([['battery', 'charging'], ['sync'], [], ['battery', 'charging']], list(export_df['keywords']))
+
+    def test_export_chunks_time_range(self):
+        chunks = export_chunks([get_model()], start=pd.Timestamp('2020-01-02'), end=pd.Timestamp('2020-01-04'))
+        self.assertEqual(['1', '2'], list(pd.concat(chunks)['status_id']))
+
+    def test_parse_timestamp(self):
+        self.assertEqual(pd.Timestamp('2020-01-01 09:00'), parse_timestamp('2020-01-01T10:00+01:00'))
+
+    def test_ndjson(self):
+        lines = b''.join(serialize(export_chunks([get_model()], chunk_size=3), 'ndjson')).decode().splitlines()
+
+        self.assertEqual(4, len(lines))
+        row = json.loads(lines[0])
+        self.assertEqual(pd.Timestamp('2020-01-01 10:00'), pd.Timestamp(row.pop('created_at')).tz_localize(None))
+        self.assertEqual({
+            'status_id': '0',
+            'account_name': 'FitbitSupport',
+            'label': 0,
+            'probability': 1.0,
+            'topic_name': 'Battery',
+            'keywords': ['battery', 'charging'],
+        }, row)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ExportFormatError):
+            check_format('csv')
+
+    @mock.patch('importlib.util.find_spec', return_value=None)
+    def test_columnar_format_without_pyarrow(self, find_spec):
+        check_format('ndjson')
+        with self.assertRaises(ExportFormatError):
+            check_format('parquet')
+
+    @unittest.skipUnless(has_pyarrow, 'requires pyarrow')
+    def test_arrow(self):
+        import pyarrow
+
+        data = b''.join(serialize(export_chunks([get_model()], chunk_size=3), 'arrow'))
+        table = pyarrow.ipc.open_stream(data).read_all()
+
+        self.assertEqual(4, table.num_rows)
+        self.assertEqual([0, 1, -1, 0], table.column('label').to_pylist())
+        self.assertEqual(['Battery', None, None, 'Battery'], table.column('topic_name').to_pylist())
+
+    @unittest.skipUnless(has_pyarrow, 'requires pyarrow')
+    def test_parquet(self):
+        import pyarrow.parquet
+
+        data = b''.join(serialize(export_chunks([get_model()], chunk_size=3), 'parquet'))
+        parquet_file = pyarrow.parquet.ParquetFile(io.BytesIO(data))
+
+        self.assertEqual(2, parquet_file.num_row_groups)
+        self.assertEqual(['0', '1', '2', '3'], parquet_file.read().column('status_id').to_pylist())
+
+    def test_main(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        model_dir = Path(tmp_dir.name)
+        with mock.patch('ri_topics.topics.MODEL_DIR', model_dir):
+            TopicModelManager(embedder=Mock(), storage=Mock()).save(get_model())
+            main(['FitbitSupport', '--start', '2020-01-03', '--output', str(model_dir / 'export.ndjson')])
+
+        lines = (model_dir / 'export.ndjson').read_text().splitlines()
+        self.assertEqual(['2', '3'], [json.loads(line)['status_id'] for line in lines])
+
+
+if __name__ == '__main__':
+    unittest.main()
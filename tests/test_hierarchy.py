@@ -0,0 +1,41 @@
+import unittest
+
+import numpy as np
+
+from ri_topics.hierarchy import build_hierarchy
+
+condensed_tree = np.array(
+    [
+        (8, 9, 1., 4), (8, 10, 1., 4),
+        (9, 0, 3., 1), (9, 1, 3., 1), (9, 2, 3., 1), (9, 3, 3., 1),
+        (10, 11, 2., 2), (10, 12, 2., 2),
+        (11, 4, 4., 1), (11, 5, 4., 1),
+        (12, 6, 5., 1), (12, 7, np.inf, 1),
+    ],
+    dtype=[('parent', np.intp), ('child', np.intp), ('lambda_val', float), ('child_size', np.intp)],
+)
+
+
+class TestBuildHierarchy(unittest.TestCase):
+    def test_fine_topics(self):
+        hierarchy_df = build_hierarchy(condensed_tree, np.array([0, 0, 0, 0, 1, 1, 2, 2]))
+
+        self.assertEqual([8, 9, 10, 11, 12], list(hierarchy_df.index))
+        self.assertEqual([-1, 8, 8, 10, 10], list(hierarchy_df['parent_id']))
+        self.assertEqual([8, 4, 4, 2, 2], list(hierarchy_df['size']))
+        np.testing.assert_almost_equal(hierarchy_df['stability'], [8., 8., 4., 4., 6.])
+        self.assertEqual([-1, 0, -1, 1, 2], list(hierarchy_df['topic_id']))
+        self.assertEqual([[0, 1, 2], [0], [1, 2], [1], [2]], list(hierarchy_df['topic_ids']))
+
+    def test_coarse_topics(self):
+        hierarchy_df = build_hierarchy(condensed_tree, np.array([0, 0, 0, 0, 1, 1, 1, -1]))
+
+        self.assertEqual([-1, 0, 1, -1, -1], list(hierarchy_df['topic_id']))
+        self.assertEqual([[0, 1], [0], [1], [], []], list(hierarchy_df['topic_ids']))
+
+    def test_without_tree(self):
+        self.assertEqual(0, len(build_hierarchy(None, np.array([0, 1]))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from ri_topics.keywords import TopicTermCounts
+
+
+class TestTopicTermCounts(unittest.TestCase):
+    def test_keywords(self):
+        counts = TopicTermCounts()
+        counts.add(
+            [
+                'The battery of my Versa drains so fast',
+                'Battery drains overnight since the update',
+                'The app does not sync with my phone',
+                'Noise tweet about everything',
+            ],
+            [0, 0, 1, -1],
+        )
+
+        keywords = counts.keywords(n=2)
+        self.assertSetEqual({0, 1}, set(keywords.keys()))
+        self.assertEqual(['battery', 'drains'], keywords[0])
+
+    def test_incremental_update(self):
+        counts = TopicTermCounts()
+        counts.add(['Battery drains fast'], [0])
+        counts.add(['Sync fails', 'Sync fails again', 'Battery drains again'], [1, 1, 0])
+
+        self.assertEqual((2, len(counts.vocabulary)), counts.counts.shape)
+        self.assertEqual('sync', counts.keywords(n=1)[1][0])
+        self.assertEqual(2, counts.counts[0, counts.vocabulary['battery']])
+
+    def test_stop_words_of_the_tweet_language(self):
+        counts = TopicTermCounts()
+        counts.add(['The app is the worst', 'The battery is the worst'], [0, 1], ['de', 'en'])
+
+        self.assertIn('the', counts.keywords()[0])
+        self.assertNotIn('the', counts.keywords()[1])
+
+    def test_empty(self):
+        self.assertEqual({}, TopicTermCounts().keywords())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from ri_topics.matching import match_topics, relabel
+
+
+def labels_by_status_id(labels):
+    return pd.Series(labels, index=[str(idx) for idx in range(len(labels))])
+
+
+class TestMatching(unittest.TestCase):
+    def test_permuted_labels(self):
+        previous = labels_by_status_id([3, 3, 3, 7, 7, 7, -1])
+        current = labels_by_status_id([1, 1, 1, 0, 0, 0, -1])
+
+        matching = match_topics(previous, current, next_topic_id=8)
+        np.testing.assert_equal(matching.label_map, [7, 3])
+        np.testing.assert_equal(matching.relabel(current.values), previous.values)
+        self.assertEqual(8, matching.next_topic_id)
+
+    def test_new_topic(self):
+        previous = labels_by_status_id([0, 0, 0, -1, -1, -1])
+        current = labels_by_status_id([0, 0, 0, 1, 1, 1])
+
+        matching = match_topics(previous, current, next_topic_id=5)
+        np.testing.assert_equal(matching.label_map, [0, 5])
+        self.assertEqual(6, matching.next_topic_id)
+
+    def test_split(self):
+        previous = labels_by_status_id([0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+        current = labels_by_status_id([0, 0, 0, 0, 0, 0, 1, 1, 1, 1])
+
+        matching = match_topics(previous, current, next_topic_id=1)
+        np.testing.assert_equal(matching.label_map, [0, 1])
+        lineage = matching.lineage_df[['parent_id', 'topic_id', 'shared_tweets']].itertuples(index=False, name=None)
+        self.assertEqual([(0, 0, 6), (0, 1, 4)], list(lineage))
+
+    def test_dissimilar_topics_are_not_matched(self):
+        previous = labels_by_status_id([0, 0, 0, 0, 0, 0, 0, 0, 0, 0])
+        current = labels_by_status_id([0, -1, -1, -1, -1, -1, -1, -1, -1, -1])
+
+        matching = match_topics(previous, current, next_topic_id=1)
+        np.testing.assert_equal(matching.label_map, [1])
+
+    def test_tweets_only_in_one_fit(self):
+        previous = pd.Series([0, 0], index=['a', 'b'])
+        current = pd.Series([0, 0, 1], index=['b', 'c', 'd'])
+
+        matching = match_topics(previous, current, next_topic_id=1)
+        np.testing.assert_equal(matching.label_map, [0, 1])
+
+    def test_relabel_noise(self):
+        np.testing.assert_equal(relabel(np.array([-1, 1, 0]), np.array([4, 2])), [-1, 2, 4])
+        np.testing.assert_equal(relabel(np.array([-1, -1]), np.array([], dtype=int)), [-1, -1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,16 @@
+import json
+import tempfile
 import unittest
+from pathlib import Path
 from unittest.mock import Mock
 from unittest import mock
 
+import numpy as np
 import pandas as pd
 
+from ri_topics.hierarchy import build_hierarchy
 from ri_topics.router import app
-from ri_topics.topics import TopicModelManager, TopicModel, pickle as topic_pickle
+from ri_topics.topics import TopicModelManager, TopicModel, joblib as topic_joblib
 
 
 def get_dummy_topic_model(*args, **kwargs):
@@ -22,23 +27,50 @@ def get_dummy_topic_model(*args, **kwargs):
         ],
         index=['0', '1', '10', '11', '20', '90'],
     ).rename_axis('status_id')
+    model.tweet_df['created_at'] = pd.date_range('2020-01-01', periods=len(model.tweet_df), freq='D')
+    model.tweet_df['account_name'] = 'FitbitSupport'
     model.topic_df = pd.DataFrame(
-        columns=['representative_id', 'text', 'name'],
+        columns=['representative_id', 'text', 'name', 'keywords'],
         data=[
-            [ '0', 'Text for cluster 0', None],
-            ['10', 'Text for cluster 1', 'Name for cluster 1'],
-            ['20', 'Text for cluster 2', None],
+            [ '0', 'Text for cluster 0', None, ['battery', 'charging']],
+            ['10', 'Text for cluster 1', 'Name for cluster 1', ['sync', 'app']],
+            ['20', 'Text for cluster 2', None, []],
         ],
         index=[0, 1, 2],
     ).rename_axis('label')
+    model.trends.add(
+        pd.Series(pd.to_datetime(['2020-01-01 10:00', '2020-01-03 10:00', '2020-01-02 10:00'])),
+        pd.Series([0, 0, 1]),
+    )
+    model.hierarchy_df = build_hierarchy(
+        np.array(
+            [
+                (6, 7, 1., 2), (6, 8, 1., 4),
+                (7, 0, 2., 1), (7, 1, 2., 1),
+                (8, 9, 2., 2), (8, 10, 2., 2),
+                (9, 2, 3., 1), (9, 3, 3., 1), (10, 4, 3., 1), (10, 5, 3., 1),
+            ],
+            dtype=[('parent', np.intp), ('child', np.intp), ('lambda_val', float), ('child_size', np.intp)],
+        ),
+        np.array([0, 0, 1, 1, 2, 2]),
+    )
+    model.vector_index.add(model.tweet_df.index, np.eye(len(model.tweet_df), 768))
     return model
 
 
-@mock.patch.object(topic_pickle, 'load', get_dummy_topic_model)
+@mock.patch.object(topic_joblib, 'load', get_dummy_topic_model)
 class TestRestEndpoint(unittest.TestCase):
     def setUp(self):
-        embedder = Mock()
-        storage = Mock(account_names=['FitbitSupport'])
+        model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(model_dir.cleanup)
+        model_dir_patch = mock.patch('ri_topics.topics.MODEL_DIR', Path(model_dir.name))
+        model_dir_patch.start()
+        self.addCleanup(model_dir_patch.stop)
+
+        embedder = Mock(**{
+            'embed_texts.side_effect': lambda texts, *args, **kwargs: np.random.random((len(texts), 768)),
+        })
+        storage = Mock(account_names=['FitbitSupport'], **{'get_all_account_names.return_value': ['FitbitSupport']})
         manager = TopicModelManager(embedder=embedder, storage=storage)
         manager_path_patch = mock.patch.object(manager, '_path')
         manager_path_patch.start()
@@ -52,11 +84,143 @@ class TestRestEndpoint(unittest.TestCase):
         self.assertEqual(
             resp.json,
             [
-                {'topic_id': 0, 'representative': {'status_id':  '0', 'text': 'Text for cluster 0'}, 'member_ids': ['0', '1'], 'name': None},
-                {'topic_id': 1, 'representative': {'status_id':  '10', 'text': 'Text for cluster 1'}, 'member_ids': ['10', '11'], 'name': 'Name for cluster 1'},
-                {'topic_id': 2, 'representative': {'status_id':  '20', 'text': 'Text for cluster 2'}, 'member_ids': ['20'], 'name': None},
+                {'topic_id': 0, 'representative': {'status_id':  '0', 'text': 'Text for cluster 0'}, 'member_ids': ['0', '1'], 'name': None, 'keywords': ['battery', 'charging']},
+                {'topic_id': 1, 'representative': {'status_id':  '10', 'text': 'Text for cluster 1'}, 'member_ids': ['10', '11'], 'name': 'Name for cluster 1', 'keywords': ['sync', 'app']},
+                {'topic_id': 2, 'representative': {'status_id':  '20', 'text': 'Text for cluster 2'}, 'member_ids': ['20'], 'name': None, 'keywords': []},
+            ]
+        )
+
+    def test_hierarchy(self):
+        resp = self.client.get('/FitbitSupport/topics/hierarchy')
+        self.assertEqual([6, 7, 8, 9, 10], [node['node_id'] for node in resp.json])
+        self.assertEqual([1, 2], resp.json[2]['topic_ids'])
+
+    def test_hierarchy_drill_down(self):
+        resp = self.client.get('/FitbitSupport/topics/hierarchy?parent=8')
+        self.assertEqual(
+            resp.json,
+            [
+                {'node_id': 9, 'parent_id': 8, 'size': 2, 'stability': 2.0, 'topic_id': 1, 'topic_ids': [1]},
+                {'node_id': 10, 'parent_id': 8, 'size': 2, 'stability': 2.0, 'topic_id': 2, 'topic_ids': [2]},
+            ]
+        )
+
+    def test_trend(self):
+        resp = self.client.get('/FitbitSupport/topics/0/trend?resolution=day')
+        self.assertEqual(
+            resp.json,
+            {
+                'topic_id': 0,
+                'resolution': 'day',
+                'timestamps': ['2020-01-01T00:00:00', '2020-01-02T00:00:00', '2020-01-03T00:00:00'],
+                'counts': [1, 0, 1],
+            }
+        )
+
+    def test_trend_unknown_topic(self):
+        self.assertEqual(404, self.client.get('/FitbitSupport/topics/9/trend').status_code)
+
+    def test_classify(self):
+        resp = self.client.post('/FitbitSupport/classify', json={
+            'tweets': [{'status_id': '100', 'text': 'My Versa keeps rebooting'}, {'text': 'The app does not sync'}],
+        })
+        self.assertEqual(
+            resp.json,
+            [
+                {'status_id': '100', 'label': -1, 'probability': 0.0},
+                {'status_id': None, 'label': -1, 'probability': 0.0},
             ]
         )
+        # requests are encoded in-process, never on the pool of encoding workers
+        app.model_manager.embedder.embed_texts.assert_called_once_with(
+            ['My Versa keeps rebooting', 'The app does not sync'], show_progess=False, langs=[None, None], use_pool=False,
+        )
+
+    def test_classify_languages(self):
+        self.client.post('/FitbitSupport/classify', json={
+            'tweets': [{'text': 'Mein Versa startet neu', 'lang': 'de'}, {'text': 'The app does not sync'}],
+        })
+        self.assertEqual(['de', None], app.model_manager.embedder.embed_texts.call_args[1]['langs'])
+
+    def test_classify_does_not_append(self):
+        resp = self.client.post('/FitbitSupport/classify', json={
+            'tweets': [{'status_id': '100', 'text': 'My Versa keeps rebooting'}],
+            'append': True,
+        })
+        self.assertEqual(400, resp.status_code)
+        self.assertNotIn('100', app.model_manager.get('FitbitSupport').tweet_df.index)
+
+    def test_classify_invalid(self):
+        resp = self.client.post('/FitbitSupport/classify', json={'tweets': [{'status_id': '100'}]})
+        self.assertEqual(400, resp.status_code)
+
+    def test_classify_empty_text(self):
+        for text in ['', '  \n']:
+            resp = self.client.post('/FitbitSupport/classify', json={'tweets': [{'status_id': '100', 'text': text}]})
+            self.assertEqual(400, resp.status_code)
+        app.model_manager.embedder.embed_texts.assert_not_called()
+
+    def test_search(self):
+        # tweets are indexed as unit vectors, so the query is closest to the third tweet '10' and then to tweet '0'
+        query_embedding = np.eye(1, 768, 2) + 0.5 * np.eye(1, 768, 0)
+        app.model_manager.embedder.embed_texts.side_effect = lambda texts, *args, **kwargs: query_embedding
+        resp = self.client.get('/FitbitSupport/search?q=battery&k=2')
+        self.assertEqual(['10', '0'], [result['status_id'] for result in resp.json])
+        self.assertEqual([1, 0], [result['label'] for result in resp.json])
+
+    def test_search_language(self):
+        app.model_manager.embedder.embed_texts.side_effect = lambda texts, *args, **kwargs: np.eye(1, 768, 0)
+        self.assertEqual(200, self.client.get('/FitbitSupport/search?q=akku&lang=de').status_code)
+        self.assertEqual(['de'], app.model_manager.embedder.embed_texts.call_args[1]['langs'])
+
+    def test_search_without_query(self):
+        self.assertEqual(400, self.client.get('/FitbitSupport/search').status_code)
+
+    def test_request_update(self):
+        self.assertEqual(202, self.client.post('/FitbitSupport/update').status_code)
+        self.assertEqual({'FitbitSupport': False}, app.model_manager.pop_update_requests())
+
+    def test_request_refit(self):
+        self.assertEqual(202, self.client.post('/FitbitSupport/update?refit=true').status_code)
+        self.assertEqual({'FitbitSupport': True}, app.model_manager.pop_update_requests())
+
+    def test_request_update_unknown_account(self):
+        self.assertEqual(404, self.client.post('/Unknown/update').status_code)
+        self.assertEqual(404, self.client.post('/Unknown/update?refit=true').status_code)
+        self.assertEqual({}, app.model_manager.pop_update_requests())
+
+    @mock.patch.dict('os.environ', {'ACCOUNT_GROUPS': 'Fitbit:FitbitSupport,FitbitDE'})
+    def test_group_topics(self):
+        def get_shared_model(*args, **kwargs):
+            model = get_dummy_topic_model()
+            model.account_name, model.member_accounts = 'Fitbit', ['FitbitSupport', 'FitbitDE']
+            return model
+
+        app.model_manager = TopicModelManager(embedder=Mock(), storage=Mock())
+        with mock.patch.object(topic_joblib, 'load', get_shared_model), mock.patch.object(app.model_manager, '_path'):
+            self.assertEqual(200, self.client.get('/Fitbit/topics/').status_code)
+            self.assertEqual(200, self.client.get('/FitbitDE/topics/').status_code)
+
+    def test_lineage(self):
+        resp = self.client.get('/FitbitSupport/topics/0/lineage')
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual([], resp.json)
+
+    def test_lineage_unknown_topic(self):
+        self.assertEqual(404, self.client.get('/FitbitSupport/topics/42/lineage').status_code)
+
+    def test_export(self):
+        resp = self.client.get('/FitbitSupport/export?start=2020-01-03&end=2020-01-05')
+        self.assertEqual(200, resp.status_code)
+        self.assertEqual('application/x-ndjson', resp.mimetype)
+        self.assertEqual(
+            [('10', 1, 'Name for cluster 1'), ('11', 1, 'Name for cluster 1')],
+            [(row['status_id'], row['label'], row['topic_name']) for row in map(json.loads, resp.data.splitlines())],
+        )
+
+    def test_export_invalid(self):
+        self.assertEqual(400, self.client.get('/FitbitSupport/export?format=csv').status_code)
+        self.assertEqual(400, self.client.get('/FitbitSupport/export?start=yesterday-ish').status_code)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+from unittest.mock import Mock, PropertyMock
+
+import pandas as pd
+
+from ri_topics.scheduling import UpdateScheduler
+from ri_topics.topics import TopicModelManager
+
+backlogs = {'A': 1, 'B': 0, 'C': 5}
+
+
+def probe_new_tweets(key, etags):
+    return pd.DataFrame({'text': ['tweet'] * backlogs[key]}), {key: f'etag-{key}'}
+
+
+class TestUpdateScheduler(unittest.TestCase):
+    def setUp(self):
+        self.manager = Mock(spec=TopicModelManager, **{
+            'model_keys': list(backlogs.keys()),
+            'pop_update_requests.return_value': {},
+            'probe_new_tweets.side_effect': probe_new_tweets,
+        })
+        self.scheduler = UpdateScheduler(self.manager, interval_minutes=60, jitter_minutes=0, intervals={'A': 10})
+
+    def test_updates_by_backlog(self):
+        self.assertEqual(['C', 'A'], self.scheduler.run_pending(now=0))
+        self.assertEqual({'A': 'etag-A', 'B': 'etag-B', 'C': 'etag-C'}, self.scheduler.etags)
+
+    def test_intervals(self):
+        self.scheduler.run_pending(now=0)
+        self.manager.probe_new_tweets.reset_mock()
+
+        self.assertEqual(['A'], self.scheduler.run_pending(now=10 * 60))
+        self.assertEqual(1, self.manager.probe_new_tweets.call_count)
+        self.assertEqual([], self.scheduler.run_pending(now=20 * 60 - 1))
+
+    def test_requested_update(self):
+        self.scheduler.run_pending(now=0)
+        self.manager.pop_update_requests.return_value = {'C': False}
+        self.assertEqual(['C'], self.scheduler.run_pending(now=1))
+
+    def test_requested_refit(self):
+        self.manager.pop_update_requests.return_value = {'B': True}
+        self.assertEqual(['B', 'C', 'A'], self.scheduler.run_pending(now=0))
+        self.manager.refit.assert_called_once_with('B')
+        self.assertNotIn('B', [call[0][0] for call in self.manager.probe_new_tweets.call_args_list])
+
+    def test_failed_update_is_retried(self):
+        def update_model(key, full_tweet_df):
+            if key == 'C':
+                raise RuntimeError('Update failed')
+
+        self.manager.update_model.side_effect = update_model
+        self.assertEqual(['A'], self.scheduler.run_pending(now=0))
+        self.assertNotIn('C', self.scheduler.etags)
+
+    def test_model_keys_are_listed_once(self):
+        model_keys = PropertyMock(return_value=list(backlogs.keys()))
+        type(self.manager).model_keys = model_keys
+        self.scheduler.run_pending(now=0)
+        self.scheduler.run_pending(now=1)
+        self.assertEqual(1, model_keys.call_count)
+
+        # accounts added since are listed again when an update is requested for them
+        model_keys.return_value = list(backlogs.keys()) + ['D']
+        self.manager.pop_update_requests.return_value = {'D': False}
+        self.manager.probe_new_tweets.reset_mock(side_effect=True)
+        self.manager.probe_new_tweets.return_value = pd.DataFrame(), {}
+        self.scheduler.run_pending(now=2)
+        self.manager.probe_new_tweets.assert_called_once_with('D', self.scheduler.etags)
+
+    @mock.patch.dict('os.environ', {'UPDATE_INTERVAL_MINUTES': ''})
+    def test_default_interval_depends_on_etags(self):
+        self.manager.probes_are_cheap = False
+        scheduler = UpdateScheduler(self.manager, jitter_minutes=0, intervals={})
+        scheduler.run_pending(now=0)
+        self.assertEqual(24 * 60 * 60, scheduler.next_probe_at['B'])
+
+        self.manager.probes_are_cheap = True
+        scheduler.run_pending(now=24 * 60 * 60)
+        self.assertEqual(25 * 60 * 60, scheduler.next_probe_at['B'])
+
+
+if __name__ == '__main__':
+    unittest.main()
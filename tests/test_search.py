@@ -0,0 +1,71 @@
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from ri_topics.search import VectorIndex
+
+
+class TestVectorIndex(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.index = VectorIndex(self.directory / 'test.vectors')
+
+    def restore(self, index: VectorIndex) -> VectorIndex:
+        restored = pickle.loads(pickle.dumps(index))
+        restored.relocate(self.directory)
+        return restored
+
+    def test_search(self):
+        self.index.add(['a', 'b'], np.array([[1., 0., 0.], [0., 2., 0.]]))
+        self.index.add(['c'], np.array([[1., 1., 0.]]))
+
+        status_ids, scores = self.index.search(np.array([1., 0.2, 0.]), k=2)
+        self.assertEqual(['a', 'c'], list(status_ids))
+        self.assertTrue(np.all(np.diff(scores) <= 0))
+
+    def test_search_mask(self):
+        self.index.add(['a', 'b', 'c'], np.eye(3))
+        status_ids, _ = self.index.search(np.array([1., 0., 0.]), k=5, mask=np.array([False, True, True]))
+        self.assertEqual(2, len(status_ids))
+        self.assertNotIn('a', status_ids)
+
+    def test_empty(self):
+        status_ids, scores = self.index.search(np.array([1., 0., 0.]))
+        self.assertEqual(0, len(status_ids))
+
+    def test_pickle(self):
+        self.index.add(['a', 'b'], np.eye(2))
+        self.index.search(np.array([1., 0.]))
+
+        restored = self.restore(self.index)
+        self.assertIsNone(restored._vectors)
+        self.assertEqual(['b'], list(restored.search(np.array([0., 1.]), k=1)[0]))
+
+    def test_add_discards_unpersisted_vectors(self):
+        self.index.add(['a'], np.eye(1, 2))
+        persisted = self.restore(self.index)
+        self.index.add(['b'], np.eye(1, 2, 1))
+
+        persisted.add(['c'], np.eye(1, 2, 1))
+        self.assertEqual(2 * 2 * 4, persisted.path.stat().st_size)
+        self.assertEqual(['a', 'c'], list(persisted.status_ids))
+
+    def test_pickle_is_relocatable(self):
+        self.index.add(['a'], np.eye(1, 2))
+        self.assertEqual(Path('test.vectors'), pickle.loads(pickle.dumps(self.index)).path)
+
+        moved_directory = self.directory / 'moved'
+        moved_directory.mkdir()
+        (self.directory / 'test.vectors').rename(moved_directory / 'test.vectors')
+        restored = pickle.loads(pickle.dumps(self.index))
+        restored.relocate(moved_directory)
+        self.assertEqual(['a'], list(restored.search(np.array([1., 0.]), k=1)[0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
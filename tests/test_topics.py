@@ -1,14 +1,19 @@
+import os
+import shutil
+import tempfile
 import unittest
+from pathlib import Path
 from typing import List
 from unittest import mock
 from unittest.mock import Mock
 
 import numpy as np
+import pandas as pd
 
 from ri_topics.clustering import Clusterer, ClusterAssignment
 from ri_topics.embedder import Embedder
 from ri_topics.openreq.ri_storage_twitter import RiStorageTwitter, Tweet
-from ri_topics.topics import TopicModel, TopicModelManager
+from ri_topics.topics import TopicModel, TopicModelManager, ModelNotReadyError
 from ri_topics.util import mock_dataclass_asdict
 
 embedding_dim = 768
@@ -23,7 +28,7 @@ labels = np.array([-1,  0,  0,  1,  1, -1, -1])
 probs =  np.array([0., 1., 1., 1., 1., 0., 0.])
 
 
-def mock_embed_texts(texts: List[str]) -> np.ndarray:
+def mock_embed_texts(texts: List[str], *args, **kwargs) -> np.ndarray:
     """Embed texts as their status_id, which is encoded as the text.
     E.g. text 3 is embedded as [3]*embedding_dim"""
 
@@ -41,6 +46,13 @@ def mock_cluster(embeddings: np.ndarray) -> ClusterAssignment:
 
 
 class TestTopicModel(unittest.TestCase):
+    def setUp(self):
+        model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(model_dir.cleanup)
+        model_dir_patch = mock.patch('ri_topics.topics.MODEL_DIR', Path(model_dir.name))
+        model_dir_patch.start()
+        self.addCleanup(model_dir_patch.stop)
+
     @mock.patch('ri_topics.topics.dataclasses')
     def test_train_and_update(self, dataclasses):
         dataclasses.asdict.side_effect = mock_dataclass_asdict
@@ -68,13 +80,124 @@ class TestTopicModel(unittest.TestCase):
         # Update
         topic_model.update(embedder, storage)
         self.assertSetEqual({'0', '1', '2', '3', '4', '5'}, set(topic_model.tweet_df.index))
+        self.assertSetEqual({'0', '1', '2', '3', '4', '5'}, set(topic_model.vector_index.status_ids))
+        self.assertIsInstance(topic_model.tweet_df['account_name'].dtype, pd.CategoricalDtype)
+
+    @mock.patch('ri_topics.topics.dataclasses')
+    def test_duplicates_are_indexed_once(self, dataclasses):
+        dataclasses.asdict.side_effect = mock_dataclass_asdict
+
+        tweets = all_tweets[:3] + [Mock(spec=Tweet, **{'status_id': '6', 'lang': 'en', 'text': '1'})]
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_tweets_by_account_name.return_value': tweets})
+        embedder = Mock(spec=Embedder, **{'embed_texts.side_effect': mock_embed_texts})
+        clusterer = Mock(spec=Clusterer, **{'fit.side_effect': mock_cluster})
+
+        topic_model = TopicModel('FitbitSupport', clusterer_factory=Mock(return_value=clusterer))
+        topic_model.train(embedder, storage)
+        self.assertSetEqual({'0', '1', '2', '6'}, set(topic_model.tweet_df.index))
+        self.assertSetEqual({'0', '1', '2'}, set(topic_model.vector_index.status_ids))
+
+    @mock.patch('ri_topics.topics.dataclasses')
+    def test_refit(self, dataclasses):
+        dataclasses.asdict.side_effect = mock_dataclass_asdict
+
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_tweets_by_account_name.return_value': all_tweets})
+        embedder = Mock(spec=Embedder, **{'embed_texts.side_effect': mock_embed_texts})
+        previous = TopicModel('FitbitSupport', clusterer_factory=Mock(return_value=Mock(spec=Clusterer, **{
+            'fit.side_effect': mock_cluster,
+        })))
+        previous.train(embedder, storage)
+        previous.topic_df.loc[1, 'name'] = 'Sync'
+
+        def cluster_permuted(embeddings: np.ndarray) -> ClusterAssignment:
+            assignment = mock_cluster(embeddings)
+            # the refit finds the same clusters, but labels them the other way around
+            return ClusterAssignment(labels=np.array([1, 0, -1])[assignment.labels],
+                                     probabilities=assignment.probabilities)
+
+        refitted_clusterer = Mock(spec=Clusterer, **{'fit.side_effect': cluster_permuted})
+        model = TopicModel('FitbitSupport', clusterer_factory=Mock(return_value=refitted_clusterer))
+        model.train(embedder, storage, previous=previous)
+
+        pd.testing.assert_series_equal(previous.tweet_df['label'], model.tweet_df['label'])
+        self.assertEqual('Sync', model.topic_df.loc[1, 'name'])
+        np.testing.assert_equal(refitted_clusterer.label_map, [1, 0])
+        self.assertEqual(1, model.generation)
+        self.assertEqual([1], list(model.lineage(1)['parent_id']))
+
+    @mock.patch.dict('os.environ', {'LANGUAGES': 'en,de'})
+    @mock.patch('ri_topics.topics.dataclasses')
+    def test_languages(self, dataclasses):
+        dataclasses.asdict.side_effect = mock_dataclass_asdict
+
+        tweets = [
+            Mock(spec=Tweet, **{'status_id': str(idx), 'lang': lang, 'text': f'{idx}'})
+            for idx, lang in enumerate(['en', 'de', 'en', 'fr', 'de', None])
+        ]
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_tweets_by_account_name.return_value': tweets})
+        embedder = Mock(spec=Embedder, **{'embed_texts.side_effect': mock_embed_texts})
+        clusterer = Mock(spec=Clusterer, **{'fit.side_effect': mock_cluster})
+
+        topic_model = TopicModel('FitbitSupport', clusterer_factory=Mock(return_value=clusterer))
+        topic_model.train(embedder, storage)
+        self.assertSetEqual({'0', '1', '2', '4'}, set(topic_model.tweet_df.index))
+        self.assertListEqual(['en', 'de', 'en', 'de'], embedder.embed_texts.call_args[1]['langs'])
+
+    @mock.patch('ri_topics.topics.dataclasses')
+    def test_shared_model(self, dataclasses):
+        dataclasses.asdict.side_effect = mock_dataclass_asdict
+
+        tweets_by_account = {
+            'FitbitSupport': [all_tweets[i] for i in [0, 1, 3]],
+            'FitbitDE': [all_tweets[i] for i in [2, 4]],
+            'FitbitFR': [all_tweets[i] for i in [5]],
+        }
+        storage = Mock(spec=RiStorageTwitter, **{
+            'get_all_tweets_by_account_name.side_effect': lambda account_name: tweets_by_account[account_name],
+        })
+        embedder = Mock(spec=Embedder, **{
+            'embed_texts.side_effect': mock_embed_texts,
+        })
+        clusterer = Mock(spec=Clusterer, **{
+            'fit.side_effect': mock_cluster,
+        })
+
+        topic_model = TopicModel('Fitbit', clusterer_factory=Mock(return_value=clusterer),
+                                 member_accounts=list(tweets_by_account.keys()))
+        topic_model.train(embedder, storage)
+        self.assertEqual(1, clusterer.fit.call_count)
+        self.assertSetEqual({'0', '1', '2', '3', '4', '5'}, set(topic_model.tweet_df.index))
+
+        support_view = topic_model.view('FitbitSupport')
+        self.assertSetEqual({'0', '1', '3'}, set(support_view.tweet_df.index))
+        self.assertSetEqual({0, 1}, set(support_view.topic_df.index))
+
+        de_view = topic_model.view('FitbitDE')
+        self.assertSetEqual({'2', '4'}, set(de_view.tweet_df.index))
+        self.assertSetEqual({0, 1}, set(de_view.topic_df.index))
+        self.assertEqual('2', de_view.topic_df.loc[0, 'representative_id'])
+
+        self.assertEqual(0, len(topic_model.view('FitbitFR').topic_df))
+        self.assertIs(topic_model, topic_model.view('Fitbit'))
+        self.assertIsInstance(topic_model.tweet_df['account_name'].dtype, pd.CategoricalDtype)
 
 
 class TestTopicModelManager(unittest.TestCase):
-    @mock.patch('ri_topics.topics.pickle')
+    def setUp(self):
+        model_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(model_dir.cleanup)
+        self.model_dir = Path(model_dir.name)
+        model_dir_patch = mock.patch('ri_topics.topics.MODEL_DIR', self.model_dir)
+        model_dir_patch.start()
+        self.addCleanup(model_dir_patch.stop)
+
+    def model_path(self, account_name: str) -> Path:
+        return self.model_dir / f'{account_name}.pickle'
+
+    @mock.patch('ri_topics.topics.joblib')
     @mock.patch('ri_topics.topics.TopicModel')
     @mock.patch.object(TopicModelManager, '_path')
-    def test_create_model(self, mock_manager_path, MockTopicModel, mock_pickle):
+    def test_create_model(self, mock_manager_path, MockTopicModel, mock_joblib):
         account_name = 'A'
 
         embedder = Mock(spec=Embedder)
@@ -84,21 +207,19 @@ class TestTopicModelManager(unittest.TestCase):
 
         MockTopicModel.return_value = Mock(**{
             'account_name': account_name,
+            'vector_index.path': self.model_dir / f'{account_name}.1.vectors',
         })
-        mock_manager_path.return_value = Mock(**{
-            'exists.return_value': False,
-            'open': mock.mock_open(),
-        })
+        mock_manager_path.side_effect = self.model_path
 
         manager = TopicModelManager(embedder, storage)
         manager.prepare_all()
-        self.assertEqual(0, mock_pickle.load.call_count)
-        self.assertEqual(1, mock_pickle.dump.call_count)
+        self.assertEqual(0, mock_joblib.load.call_count)
+        self.assertEqual(1, mock_joblib.dump.call_count)
 
-    @mock.patch('ri_topics.topics.pickle')
+    @mock.patch('ri_topics.topics.joblib')
     @mock.patch('ri_topics.topics.TopicModel')
     @mock.patch.object(TopicModelManager, '_path')
-    def test_load_model(self, mock_manager_path, MockTopicModel, mock_pickle):
+    def test_load_model(self, mock_manager_path, MockTopicModel, mock_joblib):
         account_name = 'A'
 
         embedder = Mock(spec=Embedder)
@@ -109,32 +230,32 @@ class TestTopicModelManager(unittest.TestCase):
         MockTopicModel.return_value = Mock(**{
             'account_name': account_name,
         })
-        mock_manager_path.return_value = Mock(**{
-            'exists.return_value': True,
-            'open': mock.mock_open(),
-        })
-        mock_pickle.configure_mock(**{
+        mock_manager_path.side_effect = self.model_path
+        self.model_path(account_name).touch()
+        mock_joblib.configure_mock(**{
             'load.return_value': MockTopicModel(),
         })
 
         manager = TopicModelManager(embedder, storage)
         manager.prepare_all()
-        self.assertEqual(1, mock_pickle.load.call_count)
-        self.assertEqual(0, mock_pickle.dump.call_count)
+        self.assertEqual(1, mock_joblib.load.call_count)
+        self.assertEqual(0, mock_joblib.dump.call_count)
 
-    @mock.patch('ri_topics.topics.pickle')
+    @mock.patch('ri_topics.topics.joblib')
     @mock.patch('ri_topics.topics.TopicModel')
     @mock.patch.object(TopicModelManager, '_path')
-    def test_update(self, mock_manager_path, MockTopicModel, mock_pickle):
-        topic_models = {name: Mock(account_name=name) for name in ['A', 'B', 'C']}
+    def test_update(self, mock_manager_path, MockTopicModel, mock_joblib):
+        topic_models = {
+            name: Mock(**{'account_name': name, 'vector_index.path': self.model_dir / f'{name}.1.vectors'})
+            for name in ['A', 'B', 'C']
+        }
 
         MockTopicModel.side_effect = lambda account_name: topic_models[account_name]
-        mock_manager_path.side_effect = lambda account_name: Mock(**{
-            'exists.return_value': True,
-            'open': mock.mock_open(read_data=account_name),
-        })
-        mock_pickle.configure_mock(**{
-            'load.side_effect': lambda f: topic_models[f.read()],
+        mock_manager_path.side_effect = self.model_path
+        for name in topic_models:
+            self.model_path(name).write_text(name)
+        mock_joblib.configure_mock(**{
+            'load.side_effect': lambda path, **kwargs: topic_models[path.read_text()],
         })
 
         embedder = Mock(spec=Embedder)
@@ -145,8 +266,233 @@ class TestTopicModelManager(unittest.TestCase):
         manager = TopicModelManager(embedder, storage)
         manager.update_all()
         self.assertTrue(all([model.update.called for model in topic_models.values()]))
-        self.assertEqual(len(topic_models), mock_pickle.load.call_count)
-        self.assertEqual(len(topic_models), mock_pickle.dump.call_count)
+        self.assertEqual(len(topic_models), mock_joblib.load.call_count)
+        self.assertEqual(len(topic_models), mock_joblib.dump.call_count)
+
+    @mock.patch.dict('os.environ', {'ACCOUNT_GROUPS': 'Fitbit:FitbitSupport,FitbitDE'})
+    @mock.patch('ri_topics.topics.joblib')
+    @mock.patch.object(TopicModelManager, '_path')
+    def test_account_groups(self, mock_manager_path, mock_joblib):
+        shared_model = TopicModel('Fitbit', member_accounts=['FitbitSupport', 'FitbitDE'])
+        mock_manager_path.side_effect = self.model_path
+        self.model_path('Fitbit').touch()
+        mock_joblib.configure_mock(**{
+            'load.return_value': shared_model,
+        })
+
+        storage = Mock(spec=RiStorageTwitter, **{
+            'get_all_account_names.return_value': ['FitbitSupport', 'FitbitDE', 'Other'],
+        })
+        manager = TopicModelManager(Mock(spec=Embedder), storage)
+
+        self.assertEqual(['Fitbit', 'Other'], manager.model_keys)
+        view = manager.get('FitbitDE')
+        self.assertIs(shared_model, view.model)
+        self.assertEqual('FitbitDE', view.account_name)
+        mock_manager_path.assert_called_with('Fitbit')
+        # the group itself is served by the model, which merges all its members
+        self.assertIs(shared_model, manager.get('Fitbit'))
+
+    @mock.patch.dict('os.environ', {'ACCOUNT_GROUPS': 'Fitbit:FitbitSupport,FitbitDE,FitbitFR'})
+    @mock.patch.object(TopicModel, 'train')
+    def test_account_added_to_group(self, mock_train):
+        model = TopicModel('Fitbit', member_accounts=['FitbitSupport', 'FitbitDE'])
+        model.topic_df = pd.DataFrame({'name': [None]}, index=[0])
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['FitbitSupport']})
+        TopicModelManager(Mock(spec=Embedder), storage).save(model)
+
+        manager = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True)
+        self.assertEqual(['FitbitSupport', 'FitbitDE', 'FitbitFR'], manager.get('Fitbit').member_accounts)
+        self.assertEqual(0, len(manager.get('FitbitFR').topic_df))
+
+    @mock.patch.object(TopicModel, 'train')
+    def test_reload_changed_model(self, mock_train):
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['A']})
+
+        serving_manager = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True)
+        with self.assertRaises(ModelNotReadyError):
+            serving_manager.get('A')
+
+        trainer = TopicModelManager(Mock(spec=Embedder), storage)
+        trainer.prepare_all()
+        self.assertEqual([], [path.name for path in self.model_dir.glob('**/.*.tmp')])
+        self.assertEqual('A', serving_manager.get('A').account_name)
+
+        model = trainer.get('A')
+        model.topic_df = pd.DataFrame({'name': ['Battery']}, index=[0])
+        trainer.save(model)
+        os.utime(trainer._path('A'), ns=(0, 0))  # the file system's mtime resolution may be too coarse
+        self.assertEqual('Battery', serving_manager.get('A').topic_df.loc[0, 'name'])
+
+    @mock.patch.dict('os.environ', {'MODEL_SNAPSHOTS': '2'})
+    @mock.patch.object(TopicModel, 'train')
+    def test_rename_and_snapshots(self, mock_train):
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['A']})
+        trainer = TopicModelManager(Mock(spec=Embedder), storage)
+        model = TopicModel('A')
+        model.topic_df = pd.DataFrame({'name': [None, None]}, index=[0, 1])
+        trainer.save(model)
+
+        serving_manager = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True)
+        serving_manager.rename_topic('A', 1, 'Battery')
+        self.assertEqual('Battery', serving_manager.get('A').topic_df.loc[1, 'name'])
+        self.assertEqual('Battery', trainer.get('A').topic_df.loc[1, 'name'])
+        self.assertEqual(1, len(list(self.model_dir.glob('snapshots/A/*.pickle'))))
+
+        trainer.save(trainer.get('A'))
+        trainer.save(trainer.get('A'))
+        self.assertEqual(0, (self.model_dir / 'A.names.jsonl').stat().st_size)
+        self.assertEqual(2, len(list(self.model_dir.glob('snapshots/A/*.pickle'))))
+
+        restarted = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True)
+        self.assertEqual('Battery', restarted.get('A').topic_df.loc[1, 'name'])
+
+    def test_update_requests(self):
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['A']})
+        serving_manager = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True)
+        serving_manager.request_update('A')
+
+        manager = TopicModelManager(Mock(spec=Embedder), storage)
+        self.assertEqual({'A': False}, manager.pop_update_requests())
+        self.assertEqual({}, manager.pop_update_requests())
+
+        serving_manager.request_update('A', refit=True)
+        self.assertEqual({'A': True}, manager.pop_update_requests())
+
+    @mock.patch('ri_topics.topics.dataclasses')
+    @mock.patch.object(TopicModel, 'train')
+    def test_probe_new_tweets(self, mock_train, dataclasses):
+        dataclasses.asdict.side_effect = mock_dataclass_asdict
+        storage = Mock(spec=RiStorageTwitter, **{
+            'get_all_account_names.return_value': ['A'],
+            'get_changed_tweets_by_account_name.side_effect': [(initial_tweets, 'v1'), (None, 'v1')],
+        })
+        manager = TopicModelManager(Mock(spec=Embedder), storage)
+
+        new_tweet_df, etags = manager.probe_new_tweets('A', {})
+        self.assertSetEqual({'0', '1', '3'}, set(new_tweet_df.index))
+        self.assertEqual({'A': 'v1'}, etags)
+
+        new_tweet_df, _ = manager.probe_new_tweets('A', etags)
+        self.assertEqual(0, len(new_tweet_df))
+        storage.get_changed_tweets_by_account_name.assert_called_with('A', 'v1')
+
+    @mock.patch('ri_topics.topics.dataclasses')
+    def test_recount_outdated_term_counts(self, dataclasses):
+        dataclasses.asdict.side_effect = mock_dataclass_asdict
+        storage = Mock(spec=RiStorageTwitter, **{
+            'get_all_account_names.return_value': ['A'],
+            'get_all_tweets_by_account_name.return_value': [
+                Mock(spec=Tweet, **{'status_id': '0', 'lang': 'en', 'text': 'The battery drains'}),
+            ],
+        })
+        model = TopicModel('A')
+        model.tweet_df = pd.DataFrame({'label': [0], 'probability': [1.]}, index=pd.Index(['0'], name='status_id'))
+        model.topic_df = pd.DataFrame({'name': [None], 'keywords': [[]]}, index=[0])
+        del model.term_counts.version  # counted before the counts were versioned
+        TopicModelManager(Mock(spec=Embedder), storage).save(model)
+
+        # serving-only managers can not fetch tweets, so they wait for the trainer to count the terms again
+        serving_manager = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True)
+        self.assertEqual([], serving_manager.get('A').topic_df.loc[0, 'keywords'])
+        trainer = TopicModelManager(Mock(spec=Embedder), storage)
+        self.assertEqual(['battery', 'drains'], trainer.get('A').topic_df.loc[0, 'keywords'])
+
+    @mock.patch('ri_topics.topics.dataclasses')
+    def test_backfill_created_at(self, dataclasses):
+        dataclasses.asdict.side_effect = mock_dataclass_asdict
+        storage = Mock(spec=RiStorageTwitter, **{
+            'get_all_account_names.return_value': ['A'],
+            'get_all_tweets_by_account_name.return_value': [
+                Mock(spec=Tweet, **{'status_id': str(idx), 'lang': 'en', 'text': 'The battery drains',
+                                    'created_at_full': f'2020-01-0{idx + 1}T10:00:00Z'})
+                for idx in range(2)
+            ],
+        })
+        model = TopicModel('A')
+        # persisted before the creation times and accounts of tweets were kept
+        model.tweet_df = pd.DataFrame({'label': [0, 0], 'probability': [1., 1.]},
+                                      index=pd.Index(['0', '1'], name='status_id'))
+        model.topic_df = pd.DataFrame({'name': [None], 'keywords': [[]]}, index=[0])
+        TopicModelManager(Mock(spec=Embedder), storage).save(model)
+
+        model = TopicModelManager(Mock(spec=Embedder), storage).get('A')
+        self.assertEqual([pd.Timestamp('2020-01-01 10:00'), pd.Timestamp('2020-01-02 10:00')],
+                         list(model.tweet_df['created_at']))
+        self.assertEqual(['A', 'A'], list(model.tweet_df['account_name']))
+        self.assertEqual([1, 1], list(model.trends.trend(0)))
+
+    def test_moved_models_directory(self):
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['A']})
+        model = TopicModel('A')
+        model.topic_df = pd.DataFrame({'name': [None]}, index=[0])
+        model.vector_index.add(['0'], np.eye(1, 2))
+        TopicModelManager(Mock(spec=Embedder), storage).save(model)
+
+        moved_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(moved_dir.cleanup)
+        moved_model_dir = Path(moved_dir.name) / 'models'
+        shutil.copytree(self.model_dir, moved_model_dir)
+        shutil.rmtree(self.model_dir)
+        self.model_dir.mkdir()
+        with mock.patch('ri_topics.topics.MODEL_DIR', moved_model_dir):
+            restored = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True).get('A')
+            self.assertEqual(moved_model_dir, restored.vector_index.path.parent)
+            self.assertEqual(['0'], list(restored.vector_index.search(np.array([1., 0.]), k=1)[0]))
+
+    def test_serving_maps_arrays(self):
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['A']})
+        model = TopicModel('A')
+        model.topic_df = pd.DataFrame({'name': [None]}, index=[0])
+        model.tweet_df = TopicModel._with_account_categories(pd.DataFrame({
+            'label': np.arange(1000) % 3,
+            'probability': np.ones(1000),
+            'created_at': pd.date_range('2020-01-01', periods=1000, freq='H'),
+            'account_name': 'A',
+        }, index=[str(idx) for idx in range(1000)]))
+        TopicModelManager(Mock(spec=Embedder), storage).save(model)
+
+        def is_mapped(values: np.ndarray) -> bool:
+            while values is not None:
+                if isinstance(values, np.memmap):
+                    return True
+                values = values.base
+            return False
+
+        served = TopicModelManager(Mock(spec=Embedder), storage, serving_only=True).get('A')
+        for column in ['label', 'probability', 'created_at']:
+            self.assertTrue(is_mapped(served.tweet_df[column].values), column)
+        trained = TopicModelManager(Mock(spec=Embedder), storage).get('A')
+        self.assertFalse(is_mapped(trained.tweet_df['label'].values))
+        self.assertEqual(list(np.arange(1000) % 3), list(served.tweet_df['label']))
+
+    @mock.patch.object(TopicModel, 'train')
+    def test_refit_for_new_embedding_model(self, mock_train):
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['A']})
+        model = TopicModel('A')
+        model.embedding_model = 'bert-base-nli-mean-tokens'
+        model.topic_df = pd.DataFrame({'name': ['Battery']}, index=[0])
+        TopicModelManager(Mock(spec=Embedder), storage).save(model)
+
+        embedder = Mock(spec=Embedder, model_name='distiluse-base-multilingual-cased')
+        serving_manager = TopicModelManager(embedder, storage, serving_only=True)
+        with self.assertRaises(ModelNotReadyError):
+            serving_manager.search('A', 'battery')
+        self.assertEqual('Battery', serving_manager.get('A').topic_df.loc[0, 'name'])
+
+        trainer = TopicModelManager(embedder, storage)
+        trainer.get('A')
+        mock_train.assert_called_once_with(embedder=embedder, storage=storage, previous=mock.ANY)
+        self.assertEqual('bert-base-nli-mean-tokens', mock_train.call_args[1]['previous'].embedding_model)
+
+    @mock.patch.object(TopicModel, 'train')
+    def test_persist_snapshot(self, mock_train):
+        storage = Mock(spec=RiStorageTwitter, **{'get_all_account_names.return_value': ['A']})
+        TopicModelManager(Mock(spec=Embedder), storage).prepare_all()
+
+        snapshots = list(self.model_dir.glob('snapshots/A/*.pickle'))
+        self.assertEqual(1, len(snapshots))
+        self.assertTrue(self.model_path('A').samefile(snapshots[0]))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,36 @@
+import unittest
+
+import pandas as pd
+
+from ri_topics.trends import TopicTrends
+
+
+class TestTopicTrends(unittest.TestCase):
+    def test_incremental_rollup(self):
+        trends = TopicTrends()
+        trends.add(
+            pd.Series(pd.to_datetime(['2020-01-01 10:15', '2020-01-01 10:45', '2020-01-03 08:00', '2020-01-01 09:00'])),
+            pd.Series([0, 0, 0, -1]),
+        )
+        trends.add(
+            pd.Series(pd.to_datetime(['2020-01-03 09:30', '2020-01-02 12:00', None])),
+            pd.Series([0, 1, 1]),
+        )
+
+        daily = trends.trend(0, 'day')
+        self.assertEqual(list(pd.date_range('2020-01-01', '2020-01-03', freq='D')), list(daily.index))
+        self.assertEqual([2, 0, 2], daily.tolist())
+
+        hourly = trends.trend(0, 'hour')
+        self.assertEqual(2, hourly[pd.Timestamp('2020-01-01 10:00')])
+        self.assertEqual(1, hourly[pd.Timestamp('2020-01-03 09:00')])
+        self.assertEqual(0, hourly[pd.Timestamp('2020-01-02 10:00')])
+
+        self.assertEqual([1], trends.trend(1, 'day').tolist())
+
+    def test_unknown_topic(self):
+        self.assertEqual(0, len(TopicTrends().trend(5, 'day')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
+from unittest.mock import Mock
 
-from ri_topics.util import force_trailing_slash, subpath_join
+from ri_topics.util import force_trailing_slash, subpath_join, LazyModule
 
 
 class TestForceTrailingSlash(unittest.TestCase):
@@ -27,5 +28,16 @@ class TestSubpathJoin(unittest.TestCase):
         self.assertEqual(expected, subpath_join('https://www.example.com/base/', '/sub1/sub2'))
 
 
+class TestLazyModule(unittest.TestCase):
+    def test_imports_on_first_access(self):
+        on_load = Mock()
+        lazy_json = LazyModule('json', on_load=on_load)
+        self.assertFalse(lazy_json.is_loaded)
+
+        self.assertEqual('[1]', lazy_json.dumps([1]))
+        self.assertTrue(lazy_json.is_loaded)
+        on_load.assert_called_once()
+
+
 if __name__ == '__main__':
     unittest.main()
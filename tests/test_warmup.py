@@ -0,0 +1,29 @@
+import unittest
+from unittest import mock
+
+from ri_topics.warmup import warm_up, benchmark
+
+
+class TestWarmUp(unittest.TestCase):
+    @mock.patch('ri_topics.warmup.Clusterer')
+    def test_warm_up(self, MockClusterer):
+        seconds = warm_up(n_samples=20, embedding_dim=8)
+
+        # a single fit on the tiny data set, which does not compete with training
+        MockClusterer.return_value.fit.assert_called_once()
+        embeddings, = MockClusterer.return_value.fit.call_args[0]
+        self.assertEqual((20, 8), embeddings.shape)
+        MockClusterer.return_value.predict.assert_called_once()
+        self.assertGreaterEqual(seconds, 0)
+
+    @mock.patch('ri_topics.warmup.warm_up', side_effect=[3., 5., 1., 1.])
+    def test_benchmark(self, mock_warm_up):
+        report = benchmark(sample_sizes=[20, 50], embedding_dim=8)
+
+        self.assertEqual([mock.call(20, 8), mock.call(50, 8)] * 2, mock_warm_up.call_args_list)
+        self.assertEqual(8., report.cold_seconds)
+        self.assertEqual(6., report.compile_seconds)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Entry point for serving the API from several worker processes, e.g.
+
+    gunicorn --preload --workers 4 --bind 0.0.0.0:8888 wsgi:app
+
+The workers only serve models, which are trained and updated by a separate `ROLE=trainer python main.py` process.
+With --preload, the persisted models and the SBERT model are loaded once before the workers are forked, so the
+workers initially share their memory. Models published by the trainer are picked up by every worker on their next
+request. With NUMBA_WARMUP, UMAP's numba kernels are compiled before forking as well, so the workers do not compile
+them on their first request.
+
+Models are memory-mapped: the numeric arrays of a model, like the labels of its tweets, the training data of UMAP and
+the vectors, are mapped copy-on-write from the persisted file and shared by all workers through the page cache, also
+after the trainer published a new model. Only object arrays, like status ids and texts, are a private copy of every
+worker. Each load logs the resident memory of the worker."""
+import os
+
+from dotenv import load_dotenv
+
+from ri_topics.config import env_flag
+from ri_topics.embedder import Embedder
+from ri_topics.logging import setup_logging
+from ri_topics.openreq.ri_storage_twitter import RiStorageTwitter
+from ri_topics.router import app
+from ri_topics.timing import log_duration
+from ri_topics.topics import TopicModelManager
+from ri_topics.warmup import configure_numba_cache, warm_up
+
+load_dotenv()
+configure_numba_cache()
+setup_logging()
+
+embedder = Embedder()
+rist = RiStorageTwitter(
+    base_url=os.getenv('RI_STORAGE_TWITTER_BASE_URL'),
+    bearer_token=os.getenv('BEARER_TOKEN'),
+)
+
+manager = TopicModelManager(embedder, rist, serving_only=True)
+with log_duration('Loading persisted models'):
+    manager.load_persisted()
+embedder.model  # load the SBERT model before forking the workers
+if env_flag('NUMBA_WARMUP'):
+    warm_up()
+
+app.model_manager = manager